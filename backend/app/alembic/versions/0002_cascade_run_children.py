@@ -0,0 +1,31 @@
+"""cascade run deletes to steps and artifacts
+
+Revision ID: 0002_cascade_run_children
+Revises: 0001_init
+Create Date: 2026-10-15
+
+"""
+
+from alembic import op
+
+
+revision = "0002_cascade_run_children"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def _recreate_fk(table: str, ondelete: str | None) -> None:
+    name = f"{table}_run_id_fkey"
+    op.drop_constraint(name, table, type_="foreignkey")
+    op.create_foreign_key(name, table, "runs", ["run_id"], ["id"], ondelete=ondelete)
+
+
+def upgrade():
+    _recreate_fk("steps", "CASCADE")
+    _recreate_fk("artifacts", "CASCADE")
+
+
+def downgrade():
+    _recreate_fk("artifacts", None)
+    _recreate_fk("steps", None)
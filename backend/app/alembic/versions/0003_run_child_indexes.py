@@ -0,0 +1,31 @@
+"""composite indexes for per-run step and artifact listings
+
+Revision ID: 0003_run_child_indexes
+Revises: 0002_cascade_run_children
+Create Date: 2026-10-15
+
+"""
+
+from alembic import op
+
+
+revision = "0003_run_child_indexes"
+down_revision = "0002_cascade_run_children"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The composites serve both the run_id filter and the ORDER BY, so the
+    # single-column run_id indexes become redundant.
+    op.create_index("ix_steps_run_order", "steps", ["run_id", "order"])
+    op.create_index("ix_artifacts_run_created", "artifacts", ["run_id", "created_at"])
+    op.drop_index("ix_steps_run_id", table_name="steps")
+    op.drop_index("ix_artifacts_run_id", table_name="artifacts")
+
+
+def downgrade():
+    op.create_index("ix_artifacts_run_id", "artifacts", ["run_id"])
+    op.create_index("ix_steps_run_id", "steps", ["run_id"])
+    op.drop_index("ix_artifacts_run_created", table_name="artifacts")
+    op.drop_index("ix_steps_run_order", table_name="steps")
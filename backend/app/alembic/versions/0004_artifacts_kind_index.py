@@ -0,0 +1,24 @@
+"""index artifacts by (run_id, kind, created_at)
+
+Revision ID: 0004_artifacts_kind_index
+Revises: 0003_run_child_indexes
+Create Date: 2026-10-15
+
+"""
+
+from alembic import op
+
+
+revision = "0004_artifacts_kind_index"
+down_revision = "0003_run_child_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves ArtifactRepository.get_by_kind: equality on run_id + kind, newest first.
+    op.create_index("ix_artifacts_kind_run", "artifacts", ["run_id", "kind", "created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_artifacts_kind_run", table_name="artifacts")
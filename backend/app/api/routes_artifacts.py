@@ -1,35 +1,41 @@
 from __future__ import annotations
 
-from pathlib import Path
+import os
+import stat
 
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import FileResponse
 
 from app.core.config import settings
 
 router = APIRouter()
 
+# Resolved once: realpath() walks every path component, so don't repeat it per request.
+_ARTIFACTS_ROOT = os.path.realpath(settings.artifacts_dir)
+
 
 @router.get("/text")
-def read_text(path: str) -> PlainTextResponse:
+def read_text(path: str) -> FileResponse:
     """Read a text artifact.
 
     Security: only allow reading files under ARTIFACTS_DIR.
     """
-    p = Path(path)
-
     # The DB stores absolute paths. If a client sends a relative path, resolve it under artifacts_dir.
-    if not p.is_absolute():
-        p = Path(settings.artifacts_dir) / p
+    p = path if os.path.isabs(path) else os.path.join(_ARTIFACTS_ROOT, path)
 
+    rp = os.path.realpath(p)
     try:
-        root = Path(settings.artifacts_dir).resolve()
-        rp = p.resolve()
-        if root not in rp.parents and rp != root:
+        if os.path.commonpath([rp, _ARTIFACTS_ROOT]) != _ARTIFACTS_ROOT:
             raise HTTPException(status_code=403, detail="Access denied")
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Artifact not found")
+    except ValueError:
+        raise HTTPException(status_code=403, detail="Access denied")
 
-    if not rp.exists() or not rp.is_file():
+    try:
+        st = os.stat(rp)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    if not stat.S_ISREG(st.st_mode):
         raise HTTPException(status_code=404, detail="Artifact not found")
-    return PlainTextResponse(rp.read_text(encoding="utf-8", errors="replace"))
+    # FileResponse streams from disk (zero-copy sendfile where the server supports it),
+    # so multi-MB logs never get decoded into the Python heap.
+    return FileResponse(rp, media_type="text/plain; charset=utf-8", stat_result=st)
@@ -1,91 +1,133 @@
 from __future__ import annotations
 
 import logging
+import os
 import shutil
+import stat
 import tempfile
-import zipfile
+import threading
+from email.utils import formatdate
 from pathlib import Path
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse
-from redis import Redis
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
 from rq import Queue
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
 from app.core.config import settings
+from app.core.redis import get_redis
 from app.jobs import run_pipeline_job
-from app.models.step import Step
 from app.repositories.artifacts import ArtifactRepository
 from app.repositories.runs import RunRepository
 from app.repositories.steps import StepRepository
 from app.schemas.artifact import ArtifactOut
-from app.schemas.run import RunCreate, RunOut
+from app.schemas.run import RunCreate, RunListItem, RunOut
 from app.schemas.step import StepOut
+from app.services.archives import iter_tree_files, stream_zip
 from app.services.run_overrides import load_run_overrides, save_run_overrides
 from app.services.run_workspaces import cleanup_run_workspace, reset_run_workspace
-from app.services.workspaces import resolve_workspace_path
+from app.services.workspaces import resolve_workspace_path_cached
 
 log = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def _queue() -> Queue:
-    redis = Redis.from_url(settings.redis_url)
-    return Queue("default", connection=redis)
+# Built once: validating a result and dumping it to JSON are single pydantic-core calls.
+_RUN = TypeAdapter(RunOut)
+_RUN_LIST = TypeAdapter(list[RunListItem])
+_STEP_LIST = TypeAdapter(list[StepOut])
+_ARTIFACT_LIST = TypeAdapter(list[ArtifactOut])
 
 
-def _enqueue(run_id: UUID) -> None:
+def _json_response(adapter: TypeAdapter, value: object) -> Response:
+    """Validate ORM rows (or row mappings) into ``adapter``'s type and serialize them, all in pydantic-core.
+
+    Returning a ready Response also keeps FastAPI from validating the result against
+    the route's response_model a second time; the model is still used for the docs.
+    """
+    data = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    return Response(content=data, media_type="application/json")
+
+
+_QUEUE: Queue | None = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def _queue() -> Queue:
+    global _QUEUE
+    if _QUEUE is None:
+        with _QUEUE_LOCK:
+            if _QUEUE is None:
+                _QUEUE = Queue("default", connection=get_redis())
+    return _QUEUE
+
+
+def _enqueue_many(run_ids: list[UUID]) -> None:
+    """Enqueue one pipeline job per run, flushed to Redis in a single pipeline."""
+    if not run_ids:
+        return
     q = _queue()
-    q.enqueue(
-        run_pipeline_job,
-        str(run_id),
-        job_timeout=settings.rq_job_timeout_seconds,
-        result_ttl=86400,
-        failure_ttl=86400,
+    q.enqueue_many(
+        [
+            Queue.prepare_data(
+                run_pipeline_job,
+                args=(str(run_id),),
+                timeout=settings.rq_job_timeout_seconds,
+                result_ttl=86400,
+                failure_ttl=86400,
+            )
+            for run_id in run_ids
+        ]
     )
 
 
+def _enqueue(run_id: UUID) -> None:
+    _enqueue_many([run_id])
+
+
 def _ensure_mutable(run_status: str) -> None:
     if run_status in {"queued", "running"}:
         raise HTTPException(status_code=409, detail="Run is executing. Cancel first.")
 
 
 @router.post("/", response_model=RunOut)
-def create_run(payload: RunCreate, db: Session = Depends(get_db)) -> RunOut:
+def create_run(payload: RunCreate, db: Session = Depends(get_db)) -> Response:
     runs = RunRepository(db)
     run = runs.create(
         title=payload.title, ticket_text=payload.ticket_text, workspace=payload.workspace
     )
-    return RunOut.model_validate(run)
+    return _json_response(_RUN, run)
 
 
-@router.get("/", response_model=list[RunOut])
-def list_runs(limit: int = 50, db: Session = Depends(get_db)) -> list[RunOut]:
+@router.get("/", response_model=list[RunListItem])
+def list_runs(limit: int = 50, db: Session = Depends(get_db)) -> Response:
     runs = RunRepository(db)
-    return [RunOut.model_validate(r) for r in runs.list(limit=limit)]
+    return _json_response(_RUN_LIST, runs.list_lite(limit=limit))
 
 
 @router.get("/{run_id}", response_model=RunOut)
-def get_run(run_id: UUID, db: Session = Depends(get_db)) -> RunOut:
+def get_run(run_id: UUID, db: Session = Depends(get_db)) -> Response:
     runs = RunRepository(db)
     run = runs.get(run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
-    return RunOut.model_validate(run)
+    return _json_response(_RUN, run)
 
 
 @router.get("/{run_id}/steps", response_model=list[StepOut])
-def get_steps(run_id: UUID, db: Session = Depends(get_db)) -> list[StepOut]:
+def get_steps(run_id: UUID, db: Session = Depends(get_db)) -> Response:
     steps = StepRepository(db).list_for_run(run_id)
-    return [StepOut.model_validate(s) for s in steps]
+    return _json_response(_STEP_LIST, steps)
 
 
 @router.get("/{run_id}/artifacts", response_model=list[ArtifactOut])
-def get_artifacts(run_id: UUID, db: Session = Depends(get_db)) -> list[ArtifactOut]:
+def get_artifacts(run_id: UUID, db: Session = Depends(get_db)) -> Response:
     artifacts = ArtifactRepository(db).list_for_run(run_id)
-    return [ArtifactOut.model_validate(a) for a in artifacts]
+    return _json_response(_ARTIFACT_LIST, artifacts)
 
 
 @router.post("/{run_id}/start")
@@ -95,8 +137,7 @@ def start_run(run_id: UUID, db: Session = Depends(get_db)) -> dict:
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
     _ensure_mutable(run.status)
-    runs.set_patch_decision(run_id, "no")
-    runs.set_status(run_id, "queued")
+    runs.set_state(run_id, status="queued", patch_decision="no")
     _enqueue(run_id)
     return {"ok": True, "message": "queued"}
 
@@ -114,43 +155,22 @@ def patch_decision(
     if run.status == "completed":
         raise HTTPException(status_code=409, detail="Run already completed")
 
-    runs.set_patch_decision(run_id, decision)
-
     if decision == "yes":
-        if run.status not in {"queued", "running"}:
-            runs.set_status(run_id, "queued")
+        if run.status in {"queued", "running"}:
+            runs.set_state(run_id, patch_decision=decision)
+        else:
+            runs.set_state(run_id, status="queued", patch_decision=decision)
             _enqueue(run_id)
         return {"ok": True, "message": "approved and queued"}
 
     if decision == "rejected":
-        runs.set_status(run_id, "failed")
+        runs.set_state(run_id, status="failed", patch_decision=decision)
         return {"ok": True, "message": "rejected"}
 
-    runs.set_status(run_id, "waiting_approval")
+    runs.set_state(run_id, status="waiting_approval", patch_decision=decision)
     return {"ok": True, "message": "set to no"}
 
 
-def _reset_steps_from(db: Session, run_id: UUID, from_order: int) -> None:
-    from sqlalchemy import update
-
-    stmt = (
-        update(Step)
-        .where(Step.run_id == run_id)
-        .where(Step.order >= from_order)
-        .values(
-            status="pending",
-            summary="",
-            log_path="",
-            artifact_path="",
-            started_at=None,
-            finished_at=None,
-            error="",
-        )
-    )
-    db.execute(stmt)
-    db.commit()
-
-
 @router.post("/{run_id}/retry_step")
 def retry_step(
     run_id: UUID,
@@ -178,17 +198,17 @@ def retry_step(
         raise HTTPException(status_code=404, detail=f"Step '{step}' not found")
 
     if reset_workspace:
-        base_ws = resolve_workspace_path(
+        base_ws = resolve_workspace_path_cached(
             settings.workspace_path, run.workspace, settings.workspaces_root
         )
         reset_run_workspace(str(run_id), base_ws)
 
-    _reset_steps_from(db, run_id, target.order)
+    # Not committed here: set_state() below commits the step reset and the "queued"
+    # status together, before the job is enqueued.
+    steps_repo.reset_for_run(run_id, from_order=target.order, commit=False)
 
-    if target.name in {"Propose patch", "Waiting for approval"} or target.order <= 7:
-        runs.set_patch_decision(run_id, "no")
-
-    runs.set_status(run_id, "queued")
+    reset_decision = target.name in {"Propose patch", "Waiting for approval"} or target.order <= 7
+    runs.set_state(run_id, status="queued", patch_decision="no" if reset_decision else None)
     _enqueue(run_id)
     return {"ok": True, "message": f"retry from step {target.order}: {target.name}"}
 
@@ -229,9 +249,8 @@ def retry_run(run_id: UUID, db: Session = Depends(get_db)) -> dict:
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
     _ensure_mutable(run.status)
-    steps.reset_for_run(run_id)
-    runs.set_patch_decision(run_id, "no")
-    runs.set_status(run_id, "queued")
+    steps.reset_for_run(run_id, commit=False)
+    runs.set_state(run_id, status="queued", patch_decision="no")
     _enqueue(run_id)
     return {"ok": True, "message": "queued (full retry)"}
 
@@ -247,69 +266,88 @@ def cancel_run(run_id: UUID, db: Session = Depends(get_db)) -> dict:
 
 
 @router.post("/{run_id}/delete")
-def delete_run(run_id: UUID, db: Session = Depends(get_db)) -> dict:
+def delete_run(run_id: UUID, background: BackgroundTasks, db: Session = Depends(get_db)) -> dict:
     runs = RunRepository(db)
-    steps = StepRepository(db)
-    artifacts = ArtifactRepository(db)
     run = runs.get(run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
     _ensure_mutable(run.status)
-    run_dir = Path(settings.artifacts_dir) / str(run_id)
-    if run_dir.exists():
-        shutil.rmtree(run_dir, ignore_errors=True)
-    cleanup_run_workspace(str(run_id))
-    artifacts.delete_for_run(run_id)
-    steps.delete_for_run(run_id)
+    # Steps and artifacts go with it via ON DELETE CASCADE: one statement, one commit.
     runs.delete(run_id)
+    # Run outputs can be large; remove them after the response has been sent.
+    run_dir = Path(settings.artifacts_dir) / str(run_id)
+    background.add_task(shutil.rmtree, run_dir, ignore_errors=True)
+    background.add_task(cleanup_run_workspace, str(run_id))
+    background.add_task((_downloads_dir() / f"run_{run_id}.zip").unlink, missing_ok=True)
     return {"ok": True, "message": "deleted"}
 
 
 @router.delete("/{run_id}")
-def delete_run_http(run_id: UUID, db: Session = Depends(get_db)) -> dict:
-    return delete_run(run_id=run_id, db=db)  # type: ignore[misc]
+def delete_run_http(
+    run_id: UUID, background: BackgroundTasks, db: Session = Depends(get_db)
+) -> dict:
+    return delete_run(run_id=run_id, background=background, db=db)  # type: ignore[misc]
+
+
+def _downloads_dir() -> Path:
+    return Path(settings.artifacts_dir) / "_downloads"
 
 
 @router.get("/{run_id}/download")
-def download_run_zip(run_id: UUID, db: Session = Depends(get_db)) -> FileResponse:
+def download_run_zip(run_id: UUID, db: Session = Depends(get_db)) -> Response:
     runs = RunRepository(db)
     run = runs.get(run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
 
-    run_dir = Path(settings.artifacts_dir) / str(run_id)
-    run_ws = Path(settings.run_workspaces_dir) / str(run_id)
+    run_dir = os.path.join(settings.artifacts_dir, str(run_id))
+    run_ws = os.path.join(settings.run_workspaces_dir, str(run_id))
 
-    if not run_dir.exists() and not run_ws.exists():
+    if not os.path.isdir(run_dir) and not os.path.isdir(run_ws):
         raise HTTPException(status_code=404, detail="No output found for this run")
 
-    tmp = tempfile.mkdtemp(prefix="spec2ship_run_")
-    zip_path = Path(tmp) / f"run_{run_id}.zip"
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+    def files():
         # Include artifacts (report, logs, diff, etc.)
-        if run_dir.exists():
-            for p in run_dir.rglob("*"):
-                if p.is_file():
-                    z.write(p, arcname=str(Path("artifacts") / p.relative_to(run_dir)))
-
+        yield from iter_tree_files(run_dir, "artifacts")
         # Include patched workspace source so users can deploy/download modified code directly.
-        if run_ws.exists():
-            for p in run_ws.rglob("*"):
-                if p.is_file():
-                    z.write(p, arcname=str(Path("workspace") / p.relative_to(run_ws)))
+        yield from iter_tree_files(run_ws, "workspace")
+
+    name = f"run_{run_id}.zip"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}"',
+        # Already deflated; keep GZipMiddleware from compressing it a second time.
+        "Content-Encoding": "identity",
+    }
 
-    return FileResponse(path=str(zip_path), filename=zip_path.name, media_type="application/zip")
+    if settings.use_xaccel_redirect:
+        # Build the archive on disk and let NGINX send it with sendfile(2).
+        downloads = _downloads_dir()
+        downloads.mkdir(parents=True, exist_ok=True)
+        # A unique temp file per request: this handler runs on the threadpool, so two
+        # downloads of one run may be building the archive at the same time.
+        fd, tmp_name = tempfile.mkstemp(dir=downloads, prefix=f".{name}.", suffix=".tmp")
+        tmp = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in stream_zip(files()):
+                    out.write(chunk)
+            tmp.chmod(0o644)  # mkstemp creates it 0600; NGINX must be able to read it
+            os.replace(tmp, downloads / name)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        headers["X-Accel-Redirect"] = settings.xaccel_downloads_prefix.rstrip("/") + "/" + name
+        return Response(status_code=200, media_type="application/zip", headers=headers)
+
+    return StreamingResponse(stream_zip(files()), media_type="application/zip", headers=headers)
 
 
 @router.get("/{run_id}/summary")
 def run_summary(run_id: UUID, db: Session = Depends(get_db)) -> dict:
     """Lightweight summary: run + step statuses + key artifact names."""
-    runs = RunRepository(db)
-    run = runs.get(run_id)
+    run = RunRepository(db).get_with_children(run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
-    steps = StepRepository(db).list_for_run(run_id)
-    artifacts = ArtifactRepository(db).list_for_run(run_id)
     return {
         "id": str(run.id),
         "title": run.title,
@@ -317,25 +355,74 @@ def run_summary(run_id: UUID, db: Session = Depends(get_db)) -> dict:
         "workspace": run.workspace,
         "steps": [
             {"name": s.name, "status": s.status, "summary": s.summary, "error": s.error}
-            for s in steps
+            for s in run.steps
         ],
-        "artifact_kinds": [a.kind for a in artifacts],
+        "artifact_kinds": [a.kind for a in run.artifacts],
     }
 
 
-@router.get("/{run_id}/live_log")
+# The UI polls these endpoints every second or two; the artifact path for a
+# (run, kind) pair rarely changes, so a short Redis TTL absorbs most lookups.
+_ARTIFACT_PATH_TTL_SECONDS = 2
+
+
+def _artifact_path(db: Session, run_id: UUID, kind: str) -> str:
+    key = f"spec2ship:artifact_path:{run_id}:{kind}"
+    try:
+        cached = get_redis().get(key)
+    except RedisError:
+        cached = None
+    if cached is not None:
+        return cached.decode("utf-8")
+    match = ArtifactRepository(db).get_by_kind(run_id, kind)
+    path = match.path if match and match.path else ""
+    if path:
+        try:
+            get_redis().set(key, path, ex=_ARTIFACT_PATH_TTL_SECONDS)
+        except RedisError:
+            pass
+    return path
+
+
+@router.get("/{run_id}/live_log", response_model=None)
 def live_log(
-    run_id: UUID, kind: str = Query("post_checks_log"), db: Session = Depends(get_db)
-) -> dict:
-    """Return latest content of a log artifact — for polling-based live view."""
-    artifacts = ArtifactRepository(db)
-    arts = artifacts.list_for_run(run_id)
-    match = next((a for a in arts if a.kind == kind), None)
-    if not match or not match.path:
+    request: Request,
+    run_id: UUID,
+    kind: str = Query("post_checks_log"),
+    format: str = Query("json"),
+    db: Session = Depends(get_db),
+) -> dict | Response:
+    """Return latest content of a log artifact — for polling-based live view.
+
+    ``?format=raw`` streams the file itself as text/plain instead of a JSON envelope.
+    Both forms carry ETag/Last-Modified from the file, so an unchanged log is a 304.
+    """
+    path = _artifact_path(db, run_id, kind)
+    try:
+        st = os.stat(path) if path else None
+    except OSError:
+        st = None
+    if format == "raw" and (st is None or not stat.S_ISREG(st.st_mode)):
+        raise HTTPException(status_code=404, detail="Log not found")
+    if not path:
         return {"content": "", "found": False}
+
+    validators: dict[str, str] = {}
+    if st is not None:
+        validators = {
+            "ETag": f'W/"{format}-{st.st_mtime_ns:x}-{st.st_size:x}"',
+            "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        }
+        if request.headers.get("if-none-match") == validators["ETag"]:
+            return Response(status_code=304, headers=validators)
+
+    if format == "raw":
+        return FileResponse(
+            path, media_type="text/plain; charset=utf-8", stat_result=st, headers=validators
+        )
     try:
-        content = Path(match.path).read_text(encoding="utf-8", errors="replace")
-        return {"content": content, "found": True, "path": match.path}
+        content = Path(path).read_text(encoding="utf-8", errors="replace")
+        return ORJSONResponse({"content": content, "found": True, "path": path}, headers=validators)
     except Exception as e:
         return {"content": f"(read error: {e})", "found": True}
 
@@ -343,14 +430,13 @@ def live_log(
 @router.get("/{run_id}/signals")
 def get_signals(run_id: UUID, db: Session = Depends(get_db)) -> dict:
     """Return parsed signals JSON for this run."""
-    arts = ArtifactRepository(db).list_for_run(run_id)
-    match = next((a for a in arts if a.kind == "signals_json"), None)
-    if not match or not match.path:
+    path = _artifact_path(db, run_id, "signals_json")
+    if not path:
         return {"signals": [], "found": False}
     try:
         import json
 
-        data = json.loads(Path(match.path).read_text(encoding="utf-8"))
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
         return {**data, "found": True}
     except Exception as e:
         return {"signals": [], "found": False, "error": str(e)}
@@ -1,15 +1,26 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, HTTPException, UploadFile, File, Form
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
-from app.services.workspaces import reset_sample_workspace, list_workspaces, import_workspace_zip
+from app.services.workspaces import (
+    DELETING_PREFIX,
+    reset_sample_workspace,
+    resolve_workspace_path_cached,
+    list_workspaces,
+    import_workspace_zip,
+)
 from pathlib import Path
 import shutil
 import os
+import uuid
 
 router = APIRouter()
 
+# Larger reads mean fewer thread hops per upload; 8 MiB keeps memory per request bounded.
+_UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
 
 @router.post("/sample/reset")
 def reset_sample() -> dict:
@@ -50,23 +61,25 @@ async def upload_workspace(
     uploads_dir.mkdir(parents=True, exist_ok=True)
     tmp_path = uploads_dir / f"upload_{os.getpid()}_{file.filename}"
 
-    # Stream to disk with a hard cap.
+    # Stream to disk with a hard cap. Disk writes run in the threadpool so a slow
+    # volume never stalls the event loop.
     total = 0
     try:
-        with open(tmp_path, "wb") as out:
-            while True:
-                chunk = await file.read(1024 * 1024)
-                if not chunk:
-                    break
+        out = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            while chunk := await file.read(_UPLOAD_CHUNK_BYTES):
                 total += len(chunk)
                 if total > settings.workspace_upload_max_bytes:
                     raise HTTPException(
                         status_code=413,
                         detail=f"Upload too large (>{settings.workspace_upload_max_bytes} bytes)",
                     )
-                out.write(chunk)
+                await run_in_threadpool(out.write, chunk)
+        finally:
+            await run_in_threadpool(out.close)
 
-        res = import_workspace_zip(
+        res = await run_in_threadpool(
+            import_workspace_zip,
             str(tmp_path),
             requested_name=name,
             workspaces_root=settings.workspaces_root,
@@ -74,6 +87,7 @@ async def upload_workspace(
             max_total_bytes=settings.workspace_extract_max_bytes,
             max_file_bytes=settings.workspace_extract_max_file_bytes,
         )
+        resolve_workspace_path_cached.cache_clear()
         return {
             "ok": True,
             "name": res.name,
@@ -96,7 +110,7 @@ async def upload_workspace(
 
 
 @router.delete("/{workspace_name}")
-def delete_workspace(workspace_name: str) -> dict:
+def delete_workspace(workspace_name: str, background: BackgroundTasks) -> dict:
     """Delete an uploaded workspace (sample_workspace cannot be deleted)."""
     if workspace_name == "sample_workspace":
         raise HTTPException(status_code=400, detail="Cannot delete sample_workspace")
@@ -108,5 +122,13 @@ def delete_workspace(workspace_name: str) -> dict:
         raise HTTPException(status_code=404, detail="Workspace not found")
     if not target.is_dir():
         raise HTTPException(status_code=400, detail="Not a workspace directory")
-    shutil.rmtree(target, ignore_errors=True)
+    # Rename first so the name is free (and hidden from listings) immediately,
+    # then remove the tree after the response has been sent.
+    trash = target.with_name(f"{DELETING_PREFIX}{workspace_name}_{uuid.uuid4().hex}")
+    try:
+        target.rename(trash)
+    except OSError:
+        trash = target
+    resolve_workspace_path_cached.cache_clear()
+    background.add_task(shutil.rmtree, trash, ignore_errors=True)
     return {"ok": True}
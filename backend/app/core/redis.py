@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import threading
+
+from redis import ConnectionPool, Redis
+
+from app.core.config import settings
+
+_REDIS: Redis | None = None
+_REDIS_LOCK = threading.Lock()
+
+
+def get_redis() -> Redis:
+    """Return the process-wide Redis client.
+
+    The client is built lazily on first use and shares one bounded connection pool,
+    so callers reuse open sockets instead of paying a connect (and auth) per call.
+    """
+    global _REDIS
+    if _REDIS is None:
+        with _REDIS_LOCK:
+            if _REDIS is None:
+                pool = ConnectionPool.from_url(
+                    settings.redis_url,
+                    max_connections=settings.redis_max_connections,
+                    socket_keepalive=True,
+                    health_check_interval=30,
+                )
+                _REDIS = Redis(connection_pool=pool)
+    return _REDIS
@@ -3,6 +3,15 @@ from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+# LIFO keeps the hot connections in use and lets idle ones age out via pool_recycle.
+engine = create_engine(
+    settings.database_url,
+    pool_size=settings.database_pool_size,
+    max_overflow=settings.database_max_overflow,
+    pool_timeout=settings.database_pool_timeout,
+    pool_recycle=settings.database_pool_recycle,
+    pool_pre_ping=True,
+    pool_use_lifo=True,
+)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
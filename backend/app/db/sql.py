@@ -0,0 +1,14 @@
+from sqlalchemy import func
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def utc_now() -> ColumnElement:
+    """The database's current time in UTC, as a naive timestamp.
+
+    Matches the naive-UTC ``DateTime`` columns (``datetime.utcnow`` on insert);
+    ``timezone('utc', ...)`` keeps the value independent of the session TimeZone.
+    ``clock_timestamp()`` is the actual time of the statement's execution: ``now()``
+    is frozen at transaction start and would backdate e.g. ``finished_at`` to the
+    first query of a transaction that then did long work.
+    """
+    return func.timezone("utc", func.clock_timestamp())
@@ -1,5 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.api.routes import router as api_router
 from app.core.logging import configure_logging
@@ -12,6 +14,7 @@ def create_app() -> FastAPI:
         version="0.1.0",
         docs_url="/docs",
         redoc_url="/redoc",
+        default_response_class=ORJSONResponse,
     )
 
     app.add_middleware(
@@ -22,6 +25,11 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # Logs, signals and run listings are plain text/JSON and compress ~10x on the wire.
+    # Level 5 keeps CPU per multi-MB log low; responses that set Content-Encoding
+    # themselves (e.g. the run ZIP download) are passed through untouched.
+    app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
     app.include_router(api_router)
     return app
 
@@ -0,0 +1,6 @@
+# Import every model so string-based relationship targets resolve at mapper setup.
+from app.models.artifact import Artifact
+from app.models.run import Run
+from app.models.step import Step
+
+__all__ = ["Artifact", "Run", "Step"]
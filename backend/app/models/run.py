@@ -1,12 +1,19 @@
+from __future__ import annotations
+
 import uuid
 from datetime import datetime
+from typing import TYPE_CHECKING
 
 from sqlalchemy import DateTime, String, Text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
 
+if TYPE_CHECKING:
+    from app.models.artifact import Artifact
+    from app.models.step import Step
+
 
 class Run(Base):
     __tablename__ = "runs"
@@ -22,3 +29,15 @@ class Run(Base):
 
     # approval gate
     patch_approved: Mapped[str] = mapped_column(String(10), nullable=False, default="no")
+
+    # Children are never lazy-loaded: callers opt in with selectinload() so a
+    # forgotten option fails loudly instead of issuing one query per run.
+    steps: Mapped[list[Step]] = relationship(
+        back_populates="run", lazy="raise", order_by="Step.order", passive_deletes=True
+    )
+    artifacts: Mapped[list[Artifact]] = relationship(
+        back_populates="run",
+        lazy="raise",
+        order_by="Artifact.created_at",
+        passive_deletes=True,
+    )
@@ -1,6 +1,6 @@
 from uuid import UUID
 
-from sqlalchemy import delete, select
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.models.artifact import Artifact
@@ -21,8 +21,12 @@ class ArtifactRepository:
         stmt = select(Artifact).where(Artifact.run_id == run_id).order_by(Artifact.created_at.asc())
         return list(self._db.execute(stmt).scalars().all())
 
-    def delete_for_run(self, run_id: UUID) -> int:
-        stmt = delete(Artifact).where(Artifact.run_id == run_id)
-        res = self._db.execute(stmt)
-        self._db.commit()
-        return int(res.rowcount or 0)
+    def get_by_kind(self, run_id: UUID, kind: str) -> Artifact | None:
+        """Latest artifact of ``kind`` for a run, without loading the rest."""
+        stmt = (
+            select(Artifact)
+            .where(Artifact.run_id == run_id, Artifact.kind == kind)
+            .order_by(Artifact.created_at.desc())
+            .limit(1)
+        )
+        return self._db.execute(stmt).scalars().first()
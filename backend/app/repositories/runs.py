@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import select, update
-from sqlalchemy.orm import Session
+from sqlalchemy import RowMapping, select, update
+from sqlalchemy.orm import Session, raiseload, selectinload
 
+from app.db.sql import utc_now
 from app.models.run import Run
 
 
@@ -23,10 +23,36 @@ class RunRepository:
     def get(self, run_id: UUID) -> Run | None:
         return self._db.get(Run, run_id)
 
+    def get_with_children(self, run_id: UUID) -> Run | None:
+        """Load a run with its steps and artifacts (one query per collection)."""
+        stmt = (
+            select(Run)
+            .options(selectinload(Run.steps), selectinload(Run.artifacts), raiseload("*"))
+            .where(Run.id == run_id)
+        )
+        return self._db.execute(stmt).scalar_one_or_none()
+
     def list(self, limit: int = 50) -> list[Run]:
-        stmt = select(Run).order_by(Run.created_at.desc()).limit(limit)
+        stmt = select(Run).options(raiseload("*")).order_by(Run.created_at.desc()).limit(limit)
         return list(self._db.execute(stmt).scalars().all())
 
+    def list_lite(self, limit: int = 50) -> list[RowMapping]:
+        """Recent runs for the index view: list columns only, no ticket_text, no ORM objects."""
+        stmt = (
+            select(
+                Run.id,
+                Run.title,
+                Run.workspace,
+                Run.status,
+                Run.patch_approved,
+                Run.created_at,
+                Run.updated_at,
+            )
+            .order_by(Run.created_at.desc())
+            .limit(limit)
+        )
+        return list(self._db.execute(stmt).mappings().all())
+
     def delete(self, run_id: UUID) -> None:
         from sqlalchemy import delete
 
@@ -35,23 +61,28 @@ class RunRepository:
         self._db.commit()
 
     def set_status(self, run_id: UUID, status: str) -> None:
-        stmt = (
-            update(Run).where(Run.id == run_id).values(status=status, updated_at=datetime.utcnow())
-        )
-        self._db.execute(stmt)
-        self._db.commit()
+        self.set_state(run_id, status=status)
 
     def set_patch_approved(self, run_id: UUID, approved: bool) -> None:
         self.set_patch_decision(run_id, "yes" if approved else "no")
 
     def set_patch_decision(self, run_id: UUID, decision: str) -> None:
-        decision = (decision or "no").strip().lower()
-        if decision not in {"no", "yes", "rejected"}:
-            decision = "no"
-        stmt = (
-            update(Run)
-            .where(Run.id == run_id)
-            .values(patch_approved=decision, updated_at=datetime.utcnow())
-        )
+        self.set_state(run_id, patch_decision=decision)
+
+    def set_state(
+        self, run_id: UUID, *, status: str | None = None, patch_decision: str | None = None
+    ) -> None:
+        """Update status and/or patch decision in one UPDATE and one commit."""
+        values: dict = {}
+        if status is not None:
+            values["status"] = status
+        if patch_decision is not None:
+            decision = (patch_decision or "no").strip().lower()
+            if decision not in {"no", "yes", "rejected"}:
+                decision = "no"
+            values["patch_approved"] = decision
+        if not values:
+            return
+        stmt = update(Run).where(Run.id == run_id).values(**values, updated_at=utc_now())
         self._db.execute(stmt)
         self._db.commit()
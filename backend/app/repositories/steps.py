@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import select, update
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 
+from app.db.sql import utc_now
 from app.models.step import Step
 
 
@@ -14,24 +14,30 @@ class StepRepository:
         self._db = db
 
     def init_steps(self, run_id: UUID, step_names: list[str]) -> list[Step]:
-        steps: list[Step] = []
-        for i, name in enumerate(step_names, start=1):
-            step = Step(run_id=run_id, order=i, name=name, status="pending")
-            self._db.add(step)
-            steps.append(step)
+        # One multi-row INSERT ... RETURNING instead of an add + refresh per step.
+        values = [
+            {"run_id": run_id, "order": i, "name": name, "status": "pending"}
+            for i, name in enumerate(step_names, start=1)
+        ]
+        if not values:
+            return []
+        steps = list(self._db.scalars(insert(Step).returning(Step), values))
         self._db.commit()
-        for s in steps:
-            self._db.refresh(s)
         return steps
 
     def list_for_run(self, run_id: UUID) -> list[Step]:
         stmt = select(Step).where(Step.run_id == run_id).order_by(Step.order.asc())
         return list(self._db.execute(stmt).scalars().all())
 
-    def reset_for_run(self, run_id: UUID) -> None:
+    def reset_for_run(self, run_id: UUID, from_order: int = 1, *, commit: bool = True) -> None:
+        """Reset steps with ``order >= from_order`` back to pending.
+
+        Pass ``commit=False`` to leave the UPDATE in the open transaction so the
+        caller's next commit (e.g. the run status change) makes both visible at once.
+        """
         stmt = (
             update(Step)
-            .where(Step.run_id == run_id)
+            .where(Step.run_id == run_id, Step.order >= from_order)
             .values(
                 status="pending",
                 summary="",
@@ -43,7 +49,8 @@ class StepRepository:
             )
         )
         self._db.execute(stmt)
-        self._db.commit()
+        if commit:
+            self._db.commit()
 
     def delete_for_run(self, run_id: UUID) -> None:
         from sqlalchemy import delete
@@ -52,22 +59,33 @@ class StepRepository:
         self._db.execute(stmt)
         self._db.commit()
 
-    def set_running(self, step_id: UUID) -> None:
+    def _execute(self, stmt, commit: bool) -> None:
+        # Step transitions that are immediately followed by a run status change pass
+        # commit=False so both land in the run repository's single commit.
+        self._db.execute(stmt)
+        if commit:
+            self._db.commit()
+
+    def set_running(self, step_id: UUID, *, commit: bool = True) -> None:
         stmt = (
             update(Step)
             .where(Step.id == step_id)
-            .values(status="running", started_at=datetime.utcnow(), error="")
+            .values(status="running", started_at=utc_now(), error="")
         )
-        self._db.execute(stmt)
-        self._db.commit()
+        self._execute(stmt, commit)
 
-    def set_waiting(self, step_id: UUID, summary: str = "") -> None:
+    def set_waiting(self, step_id: UUID, summary: str = "", *, commit: bool = True) -> None:
         stmt = update(Step).where(Step.id == step_id).values(status="waiting", summary=summary)
-        self._db.execute(stmt)
-        self._db.commit()
+        self._execute(stmt, commit)
 
     def set_success(
-        self, step_id: UUID, summary: str = "", log_path: str = "", artifact_path: str = ""
+        self,
+        step_id: UUID,
+        summary: str = "",
+        log_path: str = "",
+        artifact_path: str = "",
+        *,
+        commit: bool = True,
     ) -> None:
         stmt = (
             update(Step)
@@ -75,28 +93,27 @@ class StepRepository:
             .values(
                 status="success",
                 summary=summary,
-                finished_at=datetime.utcnow(),
+                finished_at=utc_now(),
                 log_path=log_path,
                 artifact_path=artifact_path,
             )
         )
-        self._db.execute(stmt)
-        self._db.commit()
+        self._execute(stmt, commit)
 
-    def set_failed(self, step_id: UUID, error: str, log_path: str = "") -> None:
+    def set_failed(
+        self, step_id: UUID, error: str, log_path: str = "", *, commit: bool = True
+    ) -> None:
         stmt = (
             update(Step)
             .where(Step.id == step_id)
-            .values(status="failed", error=error, finished_at=datetime.utcnow(), log_path=log_path)
+            .values(status="failed", error=error, finished_at=utc_now(), log_path=log_path)
         )
-        self._db.execute(stmt)
-        self._db.commit()
+        self._execute(stmt, commit)
 
-    def set_skipped(self, step_id: UUID, summary: str = "") -> None:
+    def set_skipped(self, step_id: UUID, summary: str = "", *, commit: bool = True) -> None:
         stmt = (
             update(Step)
             .where(Step.id == step_id)
-            .values(status="skipped", summary=summary, finished_at=datetime.utcnow(), error="")
+            .values(status="skipped", summary=summary, finished_at=utc_now(), error="")
         )
-        self._db.execute(stmt)
-        self._db.commit()
+        self._execute(stmt, commit)
@@ -22,3 +22,15 @@ class RunOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class RunListItem(BaseModel):
+    """A run as shown in the runs list; omits the (potentially large) ticket text."""
+
+    id: UUID
+    title: str
+    workspace: str
+    status: str
+    patch_approved: str
+    created_at: datetime
+    updated_at: datetime
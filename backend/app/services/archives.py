@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import zipfile
+import zlib
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+
+_CHUNK = 1024 * 1024
+# Files up to this size are deflated whole on a worker thread.
+_INLINE_MAX_BYTES = 4 * 1024 * 1024
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that buffers ZipFile output for a generator.
+
+    ZipFile falls back to data descriptors when ``tell``/``seek`` are unavailable,
+    which is exactly what lets us emit the archive front to back without a temp file.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_tree_files(root: str, prefix: str) -> Iterator[tuple[str, str]]:
+    """Yield ``(path, arcname)`` for every regular file under ``root``.
+
+    Uses an explicit os.scandir stack: the dirent type comes back with the listing,
+    so directories and files are told apart without an extra stat per entry.
+    Symlinked directories are not followed.
+    """
+    stack = [(root, prefix)]
+    while stack:
+        cur, arc = stack.pop()
+        try:
+            with os.scandir(cur) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            name = f"{arc}/{entry.name}"
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, name))
+                elif entry.is_file():
+                    yield entry.path, name
+            except OSError:
+                continue
+
+
+def _deflate_small_file(path: str, arcname: str) -> tuple[zipfile.ZipInfo, bytes | None]:
+    """Read and raw-deflate ``path`` in one go; ``None`` data means "stream it instead"."""
+    info = zipfile.ZipInfo.from_file(path, arcname)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    if info.file_size > _INLINE_MAX_BYTES:
+        return info, None
+    with open(path, "rb") as f:
+        raw = f.read()
+    co = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    data = co.compress(raw) + co.flush()
+    info.file_size = len(raw)
+    info.compress_size = len(data)
+    info.CRC = zlib.crc32(raw)
+    info.flag_bits = 0
+    return info, data
+
+
+def _write_deflated(z: zipfile.ZipFile, info: zipfile.ZipInfo, data: bytes) -> None:
+    # Mirrors what ZipFile does when a write handle closes, minus the compressor:
+    # sizes and CRC are already known, so no data descriptor is needed.
+    info.header_offset = z.fp.tell()
+    z.fp.write(info.FileHeader(False))
+    z.fp.write(data)
+    z.start_dir = z.fp.tell()
+    z.filelist.append(info)
+    z.NameToInfo[info.filename] = info
+
+
+def stream_zip(files: Iterable[tuple[str, str]]) -> Iterator[bytes]:
+    """Yield a deflated ZIP archive of ``files`` chunk by chunk.
+
+    Files up to ``_INLINE_MAX_BYTES`` are read and deflated on a small thread pool
+    (zlib releases the GIL), a bounded window ahead of the writer; larger files are
+    streamed through ZipFile in ``_CHUNK`` pieces so memory stays bounded.
+    """
+    sink = _ChunkSink()
+    workers = min(4, os.cpu_count() or 1)
+    with (
+        zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as z,  # type: ignore[arg-type]
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zip") as pool,
+    ):
+        pending: deque[tuple[str, Future]] = deque()
+
+        def emit(path: str, fut: Future) -> Iterator[bytes]:
+            try:
+                info, data = fut.result()
+                if data is not None:
+                    _write_deflated(z, info, data)
+                else:
+                    with open(path, "rb") as src, z.open(info, "w") as dst:
+                        while chunk := src.read(_CHUNK):
+                            dst.write(chunk)
+                            if out := sink.drain():
+                                yield out
+            except OSError:
+                # File vanished or became unreadable mid-walk; skip it.
+                return
+            if out := sink.drain():
+                yield out
+
+        for path, arcname in files:
+            pending.append((path, pool.submit(_deflate_small_file, path, arcname)))
+            if len(pending) >= workers * 2:
+                yield from emit(*pending.popleft())
+        while pending:
+            yield from emit(*pending.popleft())
+    if out := sink.drain():
+        yield out
@@ -3,6 +3,89 @@ from __future__ import annotations
 import re
 from dataclasses import dataclass
 
+# ── Compiled patterns ────────────────────────────────────────────────────────
+# Compiled once at import; the parsers run on every test/build step.
+
+# Python / pytest
+# Patterns for lines the tool always starts itself (FAILED, ERROR collecting, ●,
+# cargo "test ...") keep their literal prefix and are filtered to line starts by
+# _findall_at_line_start; a ^/MULTILINE anchor would turn off SRE's fast literal
+# search and try every offset instead.
+_PYTEST_FAILED_RE = re.compile(r"FAILED\s+(.*?)\s+-\s+(.*)")
+_PY_ASSERT_BLOCK_RE = re.compile(r"(AssertionError[^\n]*(?:\n(?:E\s+[^\n]+|\s+[^\n]+)){0,8})")
+_PYTEST_COLLECT_ERR_RE = re.compile(r"ERROR collecting\s+(.+)")
+_PY_IMPORT_ERR_RE = re.compile(r"((?:ModuleNotFoundError|ImportError)[^\n]*)")
+_PY_SYNTAX_LOC_RE = re.compile(r'File "([^"]+)", line (\d+).*\n.*\nSyntaxError: (.*)')
+_PY_SYNTAX_RE = re.compile(r"(SyntaxError[^\n]*)")
+_PY_EXC_NAMES = (
+    "TypeError",
+    "ValueError",
+    "AttributeError",
+    "KeyError",
+    "RuntimeError",
+    "NameError",
+    "IndexError",
+)
+# One alternation finds the first of these exceptions in a single pass.
+_PY_EXC_RE = re.compile(rf"({'|'.join(_PY_EXC_NAMES)})[^\n]*")
+# exc name -> traceback-location pattern, searched only for the exception found.
+_PY_EXC_LOC_RES = {
+    exc: re.compile(r'File "([^"]+)", line (\d+).*\n.*\n.*' + exc) for exc in _PY_EXC_NAMES
+}
+_PY_LINT_RE = re.compile(r"([^\s:]+\.py):(\d+):(\d+):\s+(E\d+|W\d+|F\d+)\s+(.*)")
+_MYPY_RE = re.compile(r"([^\s:]+\.py):(\d+): (error|note): (.*)")
+_PYTEST_SHORT_SUMMARY_RE = re.compile(r"(\d+\s+failed(?:,\s*\d+\s+passed)?(?:,\s*\d+\s+error)?)")
+
+# JavaScript / TypeScript
+_JEST_FAIL_FILE_RE = re.compile(r"^\s*FAIL\s+(.+)", re.MULTILINE)
+_JEST_TEST_FAIL_RE = re.compile(r"●\s+(.+)")
+_JEST_EXPECT_RE = re.compile(r"(Expected:.*\n\s*Received:.*)")
+_JS_EXC_NAMES = ("TypeError", "ReferenceError", "SyntaxError")
+_JS_EXC_RES = {exc: re.compile(rf"({exc}: [^\n]+)") for exc in _JS_EXC_NAMES}
+_JS_STACK_LOC_RE = re.compile(r"at .+ \(([^)]+):(\d+):\d+\)")
+_TSC_ERR_RE = re.compile(r"([\w./\\-]+\.tsx?)\((\d+),\d+\): error TS\d+: (.*)")
+
+# Go
+_GO_FAIL_RE = re.compile(r"--- FAIL:\s+(\S+)\s+\((.+?)\)")
+_GO_COMPILE_ERR_RE = re.compile(r"([\w./\\-]+\.go):(\d+):\d+: (.*)")
+
+# Rust
+_CARGO_FAIL_RE = re.compile(r"test (.+) \.\.\. FAILED")
+_CARGO_ERR_RE = re.compile(r"error(?:\[E\d+\])?: (.*)")
+
+
+# Scan budget. Test summaries and the last traceback sit at the end of a log, so
+# parsers look at the last _TAIL_CHARS of each stream; syntax/import errors can be
+# reported early (collection), so those patterns also see the first _HEAD_CHARS.
+# Signal details may therefore be partial for very large outputs.
+_TAIL_CHARS = 100_000
+_HEAD_CHARS = 20_000
+
+
+def _tail_text(stdout: str, stderr: str) -> str:
+    return stdout[-_TAIL_CHARS:] + "\n" + stderr[-_TAIL_CHARS:]
+
+
+def _head_and_tail_text(stdout: str, stderr: str, tail: str) -> str:
+    if len(stdout) <= _TAIL_CHARS and len(stderr) <= _TAIL_CHARS:
+        return tail
+    return stdout[:_HEAD_CHARS] + "\n" + stderr[:_HEAD_CHARS] + "\n" + tail
+
+
+def _findall_at_line_start(pattern: re.Pattern[str], text: str, lead: str = "") -> list:
+    """``pattern.findall(text)`` keeping only matches that begin a line.
+
+    ``lead`` lists characters allowed before the match on its line (indentation,
+    pytest's ``____`` banner framing).
+    """
+    out = []
+    for m in pattern.finditer(text):
+        start = m.start()
+        line_start = text.rfind("\n", 0, start) + 1
+        if not text[line_start:start].strip(lead):
+            out.append(m.groups() if pattern.groups > 1 else m.group(1))
+    return out
+
 
 @dataclass(frozen=True)
 class BugSignal:
@@ -18,12 +101,23 @@ class BugDetector:
 
     # ── Python / pytest ──────────────────────────────────────────────────────
 
-    def from_pytest_output(self, stdout: str, stderr: str) -> list[BugSignal]:
-        text = stdout + "\n" + stderr
+    def from_pytest_output(
+        self,
+        stdout: str,
+        stderr: str,
+        *,
+        text: str | None = None,
+        head_text: str | None = None,
+    ) -> list[BugSignal]:
+        if text is None:
+            text = _tail_text(stdout, stderr)
         signals: list[BugSignal] = []
 
+        # Each regex below is gated by a plain substring check: `in` is a C-level
+        # memchr-style scan, far cheaper than walking the regex over a clean log.
+
         # FAILED lines with file hint
-        fails = re.findall(r"FAILED\s+(.*?)\s+-\s+(.*)", text)
+        fails = _findall_at_line_start(_PYTEST_FAILED_RE, text) if "FAILED" in text else []
         if fails:
             joined = "\n".join([f"  {a} - {b}" for a, b in fails[:20]])
             file_hint = fails[0][0].split("::")[0] if fails else ""
@@ -38,10 +132,7 @@ class BugDetector:
             )
 
         # AssertionError with assertion introspection
-        assert_blocks = re.findall(
-            r"(AssertionError[^\n]*(?:\n(?:E\s+[^\n]+|\s+[^\n]+)){0,8})",
-            text,
-        )
+        assert_blocks = _PY_ASSERT_BLOCK_RE.findall(text) if "AssertionError" in text else []
         if assert_blocks:
             signals.append(
                 BugSignal(
@@ -53,7 +144,11 @@ class BugDetector:
             )
 
         # ERROR collecting (import errors in test files)
-        collection_errors = re.findall(r"ERROR collecting\s+(.+)", text)
+        collection_errors = (
+            _findall_at_line_start(_PYTEST_COLLECT_ERR_RE, text, "_ ")
+            if "ERROR collecting" in text
+            else []
+        )
         if collection_errors:
             signals.append(
                 BugSignal(
@@ -66,8 +161,10 @@ class BugDetector:
             )
 
         # Import / ModuleNotFound
-        if "ModuleNotFoundError" in text or "ImportError" in text:
-            m = re.search(r"((?:ModuleNotFoundError|ImportError)[^\n]*)", text)
+        if head_text is None:
+            head_text = _head_and_tail_text(stdout, stderr, text)
+        if "ModuleNotFoundError" in head_text or "ImportError" in head_text:
+            m = _PY_IMPORT_ERR_RE.search(head_text)
             signals.append(
                 BugSignal(
                     kind="runtime",
@@ -78,7 +175,7 @@ class BugDetector:
             )
 
         # SyntaxError with file location
-        syntax = re.findall(r'File "([^"]+)", line (\d+).*\n.*\nSyntaxError: (.*)', text)
+        syntax = _PY_SYNTAX_LOC_RE.findall(head_text) if "SyntaxError: " in head_text else []
         if syntax:
             f, line, msg = syntax[0]
             signals.append(
@@ -90,8 +187,8 @@ class BugDetector:
                     severity="error",
                 )
             )
-        elif "SyntaxError" in text:
-            m = re.search(r"(SyntaxError[^\n]*)", text)
+        elif "SyntaxError" in head_text:
+            m = _PY_SYNTAX_RE.search(head_text)
             if m:
                 signals.append(
                     BugSignal(
@@ -102,37 +199,29 @@ class BugDetector:
                     )
                 )
 
-        # TypeError, ValueError, AttributeError, KeyError, RuntimeError, NameError
-        for exc in [
-            "TypeError",
-            "ValueError",
-            "AttributeError",
-            "KeyError",
-            "RuntimeError",
-            "NameError",
-            "IndexError",
-        ]:
-            if exc in text:
-                m = re.search(rf"({exc}[^\n]*)", text)
-                if m:
-                    # Find file hint
-                    fh = ""
-                    ctx = re.search(r'File "([^"]+)", line (\d+).*\n.*\n.*' + exc, text)
-                    if ctx:
-                        fh = f"{ctx.group(1)}:{ctx.group(2)}"
-                    signals.append(
-                        BugSignal(
-                            kind="runtime",
-                            summary=exc,
-                            details=m.group(1)[:400],
-                            file_hint=fh,
-                            severity="error",
-                        )
-                    )
-                    break  # one is enough for the first exception
+        # TypeError, ValueError, AttributeError, KeyError, RuntimeError, NameError, IndexError
+        # — one is enough: report the first that appears in the output.
+        m = _PY_EXC_RE.search(text) if "Error" in text else None
+        if m:
+            exc = m.group(1)
+            # Find file hint
+            fh = ""
+            ctx = _PY_EXC_LOC_RES[exc].search(text) if 'File "' in text else None
+            if ctx:
+                fh = f"{ctx.group(1)}:{ctx.group(2)}"
+            signals.append(
+                BugSignal(
+                    kind="runtime",
+                    summary=exc,
+                    details=m.group(0)[:400],
+                    file_hint=fh,
+                    severity="error",
+                )
+            )
 
         # Flake8 / ruff lint
-        lint_lines = re.findall(r"([^\s:]+\.py):(\d+):(\d+):\s+(E\d+|W\d+|F\d+)\s+(.*)", text)
+        has_py_loc = ".py:" in text
+        lint_lines = _PY_LINT_RE.findall(text) if has_py_loc else []
         if lint_lines:
             details = "\n".join(
                 [f"{f}:{ln}:{c} {code} {msg}" for f, ln, c, code, msg in lint_lines[:10]]
@@ -148,7 +237,7 @@ class BugDetector:
             )
 
         # Mypy type errors
-        mypy = re.findall(r"([^\s:]+\.py):(\d+): (error|note): (.*)", text)
+        mypy = _MYPY_RE.findall(text) if has_py_loc else []
         if mypy:
             errs = [(f, ln, m) for f, ln, t, m in mypy if t == "error"]
             if errs:
@@ -163,7 +252,7 @@ class BugDetector:
                 )
 
         # Generic: short summary
-        short_summary = re.search(r"(\d+\s+failed(?:,\s*\d+\s+passed)?(?:,\s*\d+\s+error)?)", text)
+        short_summary = _PYTEST_SHORT_SUMMARY_RE.search(text) if "failed" in text else None
         if short_summary and not signals:
             signals.append(
                 BugSignal(
@@ -175,7 +264,7 @@ class BugDetector:
             )
 
         # Fallback
-        if not signals and ("fail" in text.lower() or "error" in text.lower()):
+        if not signals and ("fail" in (lower := text.lower()) or "error" in lower):
             signals.append(
                 BugSignal(
                     kind="test_failure",
@@ -189,12 +278,15 @@ class BugDetector:
 
     # ── JavaScript / TypeScript / Jest / Vitest / Mocha ───────────────────
 
-    def from_jest_output(self, stdout: str, stderr: str) -> list[BugSignal]:
-        text = stdout + "\n" + stderr
+    def from_jest_output(
+        self, stdout: str, stderr: str, *, text: str | None = None
+    ) -> list[BugSignal]:
+        if text is None:
+            text = _tail_text(stdout, stderr)
         signals: list[BugSignal] = []
 
         # FAIL / PASS summary
-        fail_files = re.findall(r"^\s*FAIL\s+(.+)", text, re.MULTILINE)
+        fail_files = _JEST_FAIL_FILE_RE.findall(text) if "FAIL" in text else []
         if fail_files:
             signals.append(
                 BugSignal(
@@ -207,7 +299,7 @@ class BugDetector:
             )
 
         # ● Test name: description
-        test_fails = re.findall(r"●\s+(.+)", text)
+        test_fails = _findall_at_line_start(_JEST_TEST_FAIL_RE, text, " \t") if "●" in text else []
         if test_fails:
             signals.append(
                 BugSignal(
@@ -219,7 +311,7 @@ class BugDetector:
             )
 
         # expect(...).toBe(...) failures
-        expect_fails = re.findall(r"(Expected:.*\n\s*Received:.*)", text)
+        expect_fails = _JEST_EXPECT_RE.findall(text) if "Received:" in text else []
         if expect_fails:
             signals.append(
                 BugSignal(
@@ -231,11 +323,11 @@ class BugDetector:
             )
 
         # TypeError / ReferenceError
-        for exc in ["TypeError", "ReferenceError", "SyntaxError"]:
-            m = re.search(rf"({exc}: [^\n]+)", text)
+        for exc, exc_re in _JS_EXC_RES.items():
+            m = exc_re.search(text) if exc in text else None
             if m:
                 fh = ""
-                ctx = re.search(r"at .+ \(([^)]+):(\d+):\d+\)", text)
+                ctx = _JS_STACK_LOC_RE.search(text)
                 if ctx:
                     fh = f"{ctx.group(1)}:{ctx.group(2)}"
                 signals.append(
@@ -250,7 +342,7 @@ class BugDetector:
                 break
 
         # TS type errors (tsc)
-        ts_errs = re.findall(r"([\w./\\-]+\.tsx?)\((\d+),\d+\): error TS\d+: (.*)", text)
+        ts_errs = _TSC_ERR_RE.findall(text) if "error TS" in text else []
         if ts_errs:
             signals.append(
                 BugSignal(
@@ -262,7 +354,7 @@ class BugDetector:
                 )
             )
 
-        if not signals and ("fail" in text.lower() or "error" in text.lower()):
+        if not signals and ("fail" in (lower := text.lower()) or "error" in lower):
             signals.append(
                 BugSignal(
                     kind="test_failure",
@@ -276,11 +368,14 @@ class BugDetector:
 
     # ── Go ────────────────────────────────────────────────────────────────
 
-    def from_go_output(self, stdout: str, stderr: str) -> list[BugSignal]:
-        text = stdout + "\n" + stderr
+    def from_go_output(
+        self, stdout: str, stderr: str, *, text: str | None = None
+    ) -> list[BugSignal]:
+        if text is None:
+            text = _tail_text(stdout, stderr)
         signals: list[BugSignal] = []
 
-        go_fails = re.findall(r"--- FAIL:\s+(\S+)\s+\((.+?)\)", text)
+        go_fails = _GO_FAIL_RE.findall(text) if "--- FAIL:" in text else []
         if go_fails:
             signals.append(
                 BugSignal(
@@ -291,7 +386,7 @@ class BugDetector:
                 )
             )
 
-        compile_errs = re.findall(r"([\w./\\-]+\.go):(\d+):\d+: (.*)", text)
+        compile_errs = _GO_COMPILE_ERR_RE.findall(text) if ".go:" in text else []
         if compile_errs:
             signals.append(
                 BugSignal(
@@ -303,7 +398,7 @@ class BugDetector:
                 )
             )
 
-        if not signals and ("FAIL" in text or "fail" in text.lower()):
+        if not signals and "fail" in text.lower():
             signals.append(
                 BugSignal(
                     kind="test_failure",
@@ -317,11 +412,14 @@ class BugDetector:
 
     # ── Rust ──────────────────────────────────────────────────────────────
 
-    def from_cargo_output(self, stdout: str, stderr: str) -> list[BugSignal]:
-        text = stdout + "\n" + stderr
+    def from_cargo_output(
+        self, stdout: str, stderr: str, *, text: str | None = None
+    ) -> list[BugSignal]:
+        if text is None:
+            text = _tail_text(stdout, stderr)
         signals: list[BugSignal] = []
 
-        cargo_fails = re.findall(r"test (.+) \.\.\. FAILED", text)
+        cargo_fails = _findall_at_line_start(_CARGO_FAIL_RE, text) if "... FAILED" in text else []
         if cargo_fails:
             signals.append(
                 BugSignal(
@@ -332,7 +430,7 @@ class BugDetector:
                 )
             )
 
-        errors = re.findall(r"error(?:\[E\d+\])?: (.*)", text)
+        errors = _CARGO_ERR_RE.findall(text) if "error" in text else []
         if errors:
             signals.append(
                 BugSignal(
@@ -359,36 +457,44 @@ class BugDetector:
 
     def from_output(self, stdout: str, stderr: str, language: str | None = None) -> list[BugSignal]:
         """Dispatch to the right parser based on detected language/output."""
-        text = stdout + "\n" + stderr
-
-        # Detect by content
-        if "pytest" in text or "PASSED" in text or "FAILED" in text and ".py" in text:
-            return self.from_pytest_output(stdout, stderr)
+        # Runner banners ("pytest", "cargo") are printed first, so detect on head + tail.
+        # Both views and the lowered copy are built once and handed to the parser.
+        tail = _tail_text(stdout, stderr)
+        text = _head_and_tail_text(stdout, stderr, tail)
+
+        def pytest() -> list[BugSignal]:
+            return self.from_pytest_output(stdout, stderr, text=tail, head_text=text)
+
+        # Detect by content. Plain `in` checks short-circuit and beat a combined marker
+        # regex here: CPython's regex engine has no fast path for a literal alternation.
+        if "pytest" in text or (("PASSED" in text or "FAILED" in text) and ".py" in text):
+            return pytest()
         if "FAIL\t" in text or "--- FAIL:" in text or ".go:" in text:
-            return self.from_go_output(stdout, stderr)
-        if "cargo" in text.lower() or ".rs:" in text:
-            return self.from_cargo_output(stdout, stderr)
+            return self.from_go_output(stdout, stderr, text=tail)
+        lower = text.lower()
+        if "cargo" in lower or ".rs:" in text:
+            return self.from_cargo_output(stdout, stderr, text=tail)
         if (
-            "jest" in text.lower()
-            or "vitest" in text.lower()
-            or "mocha" in text.lower()
+            "jest" in lower
+            or "vitest" in lower
+            or "mocha" in lower
             or ".tsx" in text
             or ".ts:" in text
         ):
-            return self.from_jest_output(stdout, stderr)
+            return self.from_jest_output(stdout, stderr, text=tail)
 
         # Language hint
         if language == "python":
-            return self.from_pytest_output(stdout, stderr)
+            return pytest()
         if language == "go":
-            return self.from_go_output(stdout, stderr)
+            return self.from_go_output(stdout, stderr, text=tail)
         if language in {"javascript", "typescript"}:
-            return self.from_jest_output(stdout, stderr)
+            return self.from_jest_output(stdout, stderr, text=tail)
         if language == "rust":
-            return self.from_cargo_output(stdout, stderr)
+            return self.from_cargo_output(stdout, stderr, text=tail)
 
         # Fallback: generic
-        return self.from_pytest_output(stdout, stderr)
+        return pytest()
 
     # Legacy
     def from_generic_output(self, output: str) -> list[BugSignal]:
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import heapq
+import os
 import re
-from dataclasses import dataclass
+from bisect import bisect_right
+from collections import Counter
+from collections.abc import Sequence
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from itertools import accumulate
 from pathlib import Path
 
 _STOPWORDS = {
@@ -73,31 +80,8 @@ _SKIP_DIRS = {
     ".eggs",
 }
 
-_SKIP_SUFFIXES = {
-    ".pyc",
-    ".pyo",
-    ".so",
-    ".dylib",
-    ".dll",
-    ".class",
-    ".jar",
-    ".ico",
-    ".png",
-    ".jpg",
-    ".jpeg",
-    ".gif",
-    ".woff",
-    ".woff2",
-    ".ttf",
-    ".eot",
-    ".zip",
-    ".tar",
-    ".gz",
-    ".pdf",
-    ".db",
-    ".sqlite",
-    ".lock",
-}
+
+_TOKEN_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]{2,}")
 
 
 @dataclass(frozen=True)
@@ -108,17 +92,14 @@ class Snippet:
     language: str = ""
 
 
-def _pick_keywords(text: str, max_keywords: int = 15) -> list[str]:
-    tokens = re.findall(r"[a-zA-Z_][a-zA-Z0-9_]{2,}", text.lower())
-    freq: dict[str, int] = {}
-    for t in tokens:
-        if t not in _STOPWORDS:
-            freq[t] = freq.get(t, 0) + 1
-    ranked = sorted(freq.items(), key=lambda kv: (kv[1], len(kv[0])), reverse=True)
-    return [k for k, _ in ranked[:max_keywords]]
+def _pick_keywords(text: str, max_keywords: int = 15) -> tuple[str, ...]:
+    freq = Counter(t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS)
+    # Same ordering as a stable sort by (count, length) desc, but O(n log k).
+    ranked = heapq.nlargest(max_keywords, freq.items(), key=lambda kv: (kv[1], len(kv[0])))
+    return tuple(k for k, _ in ranked)
 
 
-def _extract_file_hints(text: str) -> list[str]:
+def _extract_file_hints(text: str) -> tuple[str, ...]:
     candidates = re.findall(r"([\w./-]+\.(?:py|js|ts|tsx|jsx|toml|cfg|ini|yaml|yml|json))", text)
     seen: set[str] = set()
     out: list[str] = []
@@ -126,61 +107,68 @@ def _extract_file_hints(text: str) -> list[str]:
         if c not in seen:
             seen.add(c)
             out.append(c)
-    return out[:30]
+    return tuple(out[:30])
+
+
+_LANGUAGE_BY_SUFFIX = {
+    ".py": "python",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".tsx": "tsx",
+    ".jsx": "jsx",
+    ".go": "go",
+    ".rs": "rust",
+    ".java": "java",
+    ".rb": "ruby",
+    ".php": "php",
+    ".cs": "csharp",
+    ".cpp": "cpp",
+    ".c": "c",
+    ".toml": "toml",
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".json": "json",
+    ".sh": "bash",
+    ".md": "markdown",
+}
+
+
+@lru_cache(maxsize=64)
+def _language_for_suffix(suffix: str) -> str:
+    return _LANGUAGE_BY_SUFFIX.get(suffix.lower(), "")
 
 
 def _detect_language(path: Path) -> str:
-    ext = path.suffix.lower()
-    return {
-        ".py": "python",
-        ".js": "javascript",
-        ".ts": "typescript",
-        ".tsx": "tsx",
-        ".jsx": "jsx",
-        ".go": "go",
-        ".rs": "rust",
-        ".java": "java",
-        ".rb": "ruby",
-        ".php": "php",
-        ".cs": "csharp",
-        ".cpp": "cpp",
-        ".c": "c",
-        ".toml": "toml",
-        ".yaml": "yaml",
-        ".yml": "yaml",
-        ".json": "json",
-        ".sh": "bash",
-        ".md": "markdown",
-    }.get(ext, "")
-
-
-def _should_skip(p: Path, root: Path) -> bool:
-    try:
-        rel = p.relative_to(root)
-        for part in rel.parts[:-1]:
-            if part in _SKIP_DIRS or part.startswith("."):
-                return True
-    except ValueError:
-        return True
-    if p.suffix.lower() in _SKIP_SUFFIXES:
-        return True
-    if p.name.endswith(".min.js") or p.name.endswith(".bundle.js"):
-        return True
-    return False
-
-
-def _best_excerpt(content: str, keywords: list[str], context_lines: int = 60) -> str:
+    return _language_for_suffix(path.suffix)
+
+
+def _best_excerpt(content: str, keywords: Sequence[str], context_lines: int = 60) -> str:
     lines = content.splitlines()
     if not lines:
         return ""
     window = min(context_lines * 2, len(lines))
 
+    # Locate every keyword hit once (str.find, non-overlapping per keyword exactly
+    # like str.count), bucket hits per line, then score each window from prefix
+    # sums instead of re-joining, re-lowering and re-counting every window.
+    lowered = content.lower()
+    line_ends = list(accumulate(len(ln) for ln in lowered.splitlines(keepends=True)))
+    per_line = [0] * len(line_ends)
+    for kw in keywords:
+        if not kw:
+            continue
+        i = lowered.find(kw)
+        while i != -1:
+            per_line[bisect_right(line_ends, i)] += 1
+            i = lowered.find(kw, i + len(kw))
+    prefix = [0, *accumulate(per_line)]
+
     best_start = 0
     best_density = 0
     step = max(1, window // 2)
-    for start in range(0, max(1, len(lines) - window), step):
-        chunk = "\n".join(lines[start : start + window]).lower()
-        density = sum(chunk.count(kw) for kw in keywords)
+    n = len(lines)
+    for start in range(0, max(1, n - window), step):
+        density = prefix[min(start + window, n)] - prefix[start]
         if density > best_density:
             best_density = density
             best_start = start
@@ -214,6 +202,97 @@ def _workspace_tree(root: Path, max_entries: int = 60) -> str:
     return "\n".join(lines)
 
 
+# Files considered for context, in the order the old per-pattern rglob passes found
+# them: extensions first, then manifest names (setup.py is already a *.py match).
+_CANDIDATE_SUFFIXES = (".py", ".js", ".ts", ".tsx", ".jsx", ".go", ".rs", ".rb", ".java", ".php")
+_CANDIDATE_NAMES = ("pyproject.toml", "package.json", "requirements.txt", "setup.cfg")
+_CANDIDATE_RANK = {k: i for i, k in enumerate(_CANDIDATE_SUFFIXES + _CANDIDATE_NAMES)}
+
+
+def _iter_candidate_files(root: Path) -> list[Path]:
+    """Collect candidate files in one os.scandir walk.
+
+    Walks directories depth-first in pre-order without following symlinked dirs,
+    pruning skipped and hidden directories, and buckets files by the first pattern
+    they match so the result is ordered exactly like the rglob-per-pattern scan.
+    """
+    buckets: list[list[Path]] = [[] for _ in _CANDIDATE_RANK]
+    stack = [str(root)]
+    while stack:
+        cur = stack.pop()
+        try:
+            with os.scandir(cur) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        subdirs: list[str] = []
+        for entry in entries:
+            name = entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not name.startswith(".") and name not in _SKIP_DIRS:
+                        subdirs.append(entry.path)
+                    continue
+                dot = name.rfind(".")
+                rank = _CANDIDATE_RANK.get(name[dot:] if dot != -1 else "")
+                if rank is None:
+                    rank = _CANDIDATE_RANK.get(name)
+                if rank is None or not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if name.endswith(".min.js") or name.endswith(".bundle.js"):
+                continue
+            buckets[rank].append(Path(entry.path))
+        stack.extend(reversed(subdirs))
+    return [p for bucket in buckets for p in bucket]
+
+
+def _score_files(
+    paths: list[Path],
+    *,
+    root: Path,
+    keywords: tuple[str, ...],
+    file_hints: tuple[str, ...],
+    failing: bool,
+) -> list[Snippet]:
+    kw_bytes = [kw.encode("utf-8") for kw in keywords]
+    out: list[Snippet] = []
+    for p in paths:
+        rel = str(p.relative_to(root))
+        # endswith() implied containment, so one substring test per hint suffices.
+        score = 30 * sum(hint in rel for hint in file_hints)
+        if failing and "test" in rel.lower():
+            score += 10
+        if p.name in {"pyproject.toml", "package.json", "requirements.txt"}:
+            score += 5
+        if not kw_bytes and score <= 0:
+            continue  # nothing left that could make this file score
+
+        try:
+            if p.stat().st_size > 300_000:
+                continue
+            # Keywords are ASCII identifiers, so counting can run on ASCII-lowered bytes.
+            lower = p.read_bytes().lower()
+        except Exception:
+            continue
+        score += sum(lower.count(kw) * 2 for kw in kw_bytes)
+        if score <= 0:
+            continue
+
+        # Excerpts are built later, only for the files that make the cut.
+        out.append(Snippet(path=rel, score=score, excerpt="", language=_detect_language(p)))
+    return out
+
+
+def _with_excerpt(root: Path, snip: Snippet, keywords: Sequence[str]) -> Snippet:
+    try:
+        content = (root / snip.path).read_bytes().decode("utf-8", errors="ignore")
+    except Exception:
+        return snip
+    return replace(snip, excerpt=_best_excerpt(content, keywords))
+
+
 def build_code_context(
     workspace_path: str,
     ticket_text: str,
@@ -226,67 +305,15 @@ def build_code_context(
     keywords = _pick_keywords(ticket_text + "\n" + signals_text)
     file_hints = _extract_file_hints(signals_text)
 
-    patterns = [
-        "*.py",
-        "*.js",
-        "*.ts",
-        "*.tsx",
-        "*.jsx",
-        "*.go",
-        "*.rs",
-        "*.rb",
-        "*.java",
-        "*.php",
-        "pyproject.toml",
-        "package.json",
-        "requirements.txt",
-        "setup.py",
-        "setup.cfg",
-    ]
-
-    seen: set[Path] = set()
-    snippets: list[Snippet] = []
-
-    for pat in patterns:
-        for p in root.rglob(pat):
-            if not p.is_file() or p in seen:
-                continue
-            if _should_skip(p, root):
-                continue
-            seen.add(p)
-            try:
-                if p.stat().st_size > 300_000:
-                    continue
-                content = p.read_text(encoding="utf-8", errors="ignore")
-            except Exception:
-                continue
-
-            rel = str(p.relative_to(root))
-            lower = content.lower()
-            score = sum(lower.count(kw) * 2 for kw in keywords)
-            for hint in file_hints:
-                if rel.endswith(hint) or hint in rel:
-                    score += 30
-            if "test" in rel.lower() and any(
-                k in signals_text.lower() for k in ["fail", "error", "assert"]
-            ):
-                score += 10
-            if p.name in {"pyproject.toml", "package.json", "requirements.txt"}:
-                score += 5
-            if score <= 0:
-                continue
+    candidates = _iter_candidate_files(root)
 
-            snippets.append(
-                Snippet(
-                    path=rel,
-                    score=score,
-                    excerpt=_best_excerpt(content, keywords),
-                    language=_detect_language(p),
-                )
-            )
+    failing = any(k in signals_text.lower() for k in ["fail", "error", "assert"])
+    snippets = _score_files(
+        candidates, root=root, keywords=keywords, file_hints=file_hints, failing=failing
+    )
 
     snippets.sort(key=lambda s: s.score, reverse=True)
-    snippets = snippets[:max_files]
+    snippets = [_with_excerpt(root, s, keywords) for s in snippets[:max_files]]
 
     parts: list[str] = []
     parts.append(f"**Keywords**: {', '.join(keywords) if keywords else '(none)'}")
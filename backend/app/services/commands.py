@@ -1,8 +1,20 @@
 from __future__ import annotations
 
 import subprocess
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
+from typing import IO
+
+# Only the tail of each stream is kept: failures and summaries are at the end, and a
+# chatty training or eval script must not grow the worker's memory without bound.
+_MAX_CAPTURE_BYTES = 200_000
+_READ_CHUNK = 64 * 1024
+# After the command exits (or is killed on timeout), grandchildren may still hold the
+# pipes open; don't wait on them.
+_DRAIN_JOIN_SECONDS = 2
 
 
 @dataclass(frozen=True)
@@ -12,34 +24,97 @@ class CommandResult:
     stderr: str
 
 
+class _TailBuffer:
+    """Collects a pipe's output on a daemon thread, keeping the last ``limit`` bytes."""
+
+    def __init__(self, pipe: IO[bytes], limit: int = _MAX_CAPTURE_BYTES) -> None:
+        self._pipe = pipe
+        self._limit = limit
+        self._chunks: deque[bytes] = deque()
+        self._size = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self) -> None:
+        try:
+            while chunk := self._pipe.read1(_READ_CHUNK):  # type: ignore[attr-defined]
+                with self._lock:
+                    self._chunks.append(chunk)
+                    self._size += len(chunk)
+                    while self._size - len(self._chunks[0]) >= self._limit:
+                        dropped = self._chunks.popleft()
+                        self._size -= len(dropped)
+                        self._dropped += len(dropped)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._pipe.close()
+
+    def text(self, deadline: float | None = None) -> str:
+        self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            data = b"".join(self._chunks)
+            dropped = self._dropped
+        if len(data) > self._limit:
+            dropped += len(data) - self._limit
+            data = data[-self._limit :]
+        out = data.decode("utf-8", errors="ignore")
+        if dropped:
+            out = f"[... {dropped} earlier bytes truncated]\n{out}"
+        return out
+
+
+def _feed(pipe: IO[bytes], data: bytes) -> None:
+    try:
+        pipe.write(data)
+    except (BrokenPipeError, OSError, ValueError):
+        pass  # the command exited (or stopped reading) early; its exit code says why
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
 class CommandRunner:
     def __init__(self, cwd: str, timeout_seconds: int = 90) -> None:
         self._cwd = Path(cwd)
         self._timeout = timeout_seconds
 
-    def run(self, cmd: list[str], timeout_seconds: int | None = None) -> CommandResult:
+    def run(
+        self, cmd: list[str], timeout_seconds: int | None = None, *, input: str | None = None
+    ) -> CommandResult:
+        """Run ``cmd``; ``input``, if given, is written to its stdin as UTF-8."""
         to = self._timeout if timeout_seconds is None else timeout_seconds
+        proc = subprocess.Popen(
+            cmd,
+            cwd=self._cwd,
+            stdin=None if input is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if input is not None:
+            # Fed from a thread so a command that never reads stdin can't block us past
+            # the timeout; the tail readers keep its output pipes drained meanwhile.
+            data = input.encode("utf-8")
+            threading.Thread(target=_feed, args=(proc.stdin, data), daemon=True).start()
+        out_buf = _TailBuffer(proc.stdout)  # type: ignore[arg-type]
+        err_buf = _TailBuffer(proc.stderr)  # type: ignore[arg-type]
         try:
-            completed = subprocess.run(
-                cmd,
-                cwd=self._cwd,
-                capture_output=True,
-                text=True,
-                timeout=to,
-            )
-            return CommandResult(
-                code=completed.returncode, stdout=completed.stdout, stderr=completed.stderr
-            )
-        except subprocess.TimeoutExpired as e:
-            out = (
-                (e.stdout or "")
-                if isinstance(e.stdout, str)
-                else (e.stdout.decode(errors="ignore") if e.stdout else "")
-            )
-            err = (
-                (e.stderr or "")
-                if isinstance(e.stderr, str)
-                else (e.stderr.decode(errors="ignore") if e.stderr else "")
-            )
+            code = proc.wait(timeout=to)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            deadline = time.monotonic() + _DRAIN_JOIN_SECONDS
+            out = out_buf.text(deadline)
+            err = err_buf.text(deadline)
             err = err + f"\n[timeout] command exceeded {to}s"
             return CommandResult(code=124, stdout=out, stderr=err)
+        # A backgrounded grandchild can keep the pipes open long after the command
+        # exits; collect what is there by a short deadline instead of waiting on it.
+        deadline = time.monotonic() + _DRAIN_JOIN_SECONDS
+        return CommandResult(
+            code=code, stdout=out_buf.text(deadline), stderr=err_buf.text(deadline)
+        )
@@ -19,10 +19,13 @@ def unified_diff(before: dict[str, str], after: dict[str, str]) -> str:
     paths = sorted(set(before.keys()) | set(after.keys()))
     chunks: list[str] = []
     for path in paths:
-        a = before.get(path, "").splitlines(keepends=True)
-        b = after.get(path, "").splitlines(keepends=True)
-        if a == b:
+        a_raw = before.get(path, "")
+        b_raw = after.get(path, "")
+        # Most files are untouched; compare the raw strings before splitting them.
+        if a_raw == b_raw:
             continue
+        a = a_raw.splitlines(keepends=True)
+        b = b_raw.splitlines(keepends=True)
         # Add diff --git header so git apply works reliably in all modes
         chunks.append(f"diff --git a/{path} b/{path}\n")
         chunks.extend(
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from functools import lru_cache
+
+_MAX_LINES = 60
+
 
 def parse_spec2ship_directives(ticket_text: str) -> tuple[str | None, dict[str, str]]:
     """Parse a small, copy/paste-friendly directive block from ticket_text.
@@ -11,16 +15,38 @@ def parse_spec2ship_directives(ticket_text: str) -> tuple[str | None, dict[str,
         key=value
 
     Lines starting with # are treated as comments, except "#spec2ship:".
+
+    Results are memoized per ticket text (the job and the pipeline both parse the
+    same ticket); each call gets its own cfg dict so callers may mutate it.
     """
+    mode, items = _parse_cached(ticket_text or "")
+    return mode, dict(items)
 
+
+@lru_cache(maxsize=256)
+def _parse_cached(ticket_text: str) -> tuple[str | None, tuple[tuple[str, str], ...]]:
     mode: str | None = None
     cfg: dict[str, str] = {}
 
     if not ticket_text:
-        return None, cfg
+        return None, ()
+
+    # Only the first _MAX_LINES lines are read, so never split the rest of the ticket.
+    # Every "\n" is also a splitlines() break, so cutting after the last needed "\n"
+    # keeps at least those lines intact.
+    head = ticket_text
+    end = -1
+    for _ in range(_MAX_LINES):
+        end = ticket_text.find("\n", end + 1)
+        if end == -1:
+            break
+    else:
+        head = ticket_text[:end]
+    if "=" not in head and "#spec2ship:" not in head.lower():
+        return None, ()
 
-    for raw in ticket_text.splitlines()[:60]:
-        line = (raw or "").strip()
+    for raw in head.splitlines()[:_MAX_LINES]:
+        line = raw.strip()
         if not line:
             continue
 
@@ -40,4 +66,4 @@ def parse_spec2ship_directives(ticket_text: str) -> tuple[str | None, dict[str,
             if k:
                 cfg[k] = v
 
-    return mode, cfg
+    return mode, tuple(cfg.items())
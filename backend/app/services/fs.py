@@ -1,31 +1,63 @@
 from __future__ import annotations
 
-import json
+import os
 from pathlib import Path
 
+import orjson
+
+_JSON_OPTS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+
+def decode_text(data: bytes) -> str:
+    """Decode UTF-8 file bytes the way ``Path.read_text`` would, newlines included.
+
+    One bytes.decode() is cheaper than streaming the file through TextIOWrapper;
+    universal-newline translation is only needed when a ``\\r`` is present.
+    """
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
 
 class FileStore:
     def __init__(self, base_dir: str) -> None:
         self._base = Path(base_dir)
         self._base.mkdir(parents=True, exist_ok=True)
+        # run_ids whose directory this store already created. mkdir(exist_ok=True) is
+        # idempotent, so racing callers at worst both create it; no lock needed.
+        self._known_runs: set[str] = set()
 
     def run_dir(self, run_id: str) -> Path:
         d = self._base / run_id
-        d.mkdir(parents=True, exist_ok=True)
+        if run_id not in self._known_runs:
+            d.mkdir(parents=True, exist_ok=True)
+            self._known_runs.add(run_id)
         return d
 
     def write_text(self, run_id: str, name: str, content: str) -> str:
         path = self.run_dir(run_id) / name
-        path.write_text(content, encoding="utf-8")
+        self._atomic_write_bytes(path, content.encode("utf-8"))
         return str(path)
 
     def write_json(self, run_id: str, name: str, obj) -> str:
         path = self.run_dir(run_id) / name
-        path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+        self._atomic_write_bytes(path, orjson.dumps(obj, option=_JSON_OPTS))
         return str(path)
 
+    def _atomic_write_bytes(self, path: Path, data: bytes) -> None:
+        # Readers see either the old file or the new one, never a truncated write.
+        # The pid keeps concurrent workers writing the same artifact off each other's tmp.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
     def read_text(self, path: str) -> str:
-        return Path(path).read_text(encoding="utf-8")
+        return decode_text(Path(path).read_bytes())
 
     def exists(self, path: str) -> bool:
         return Path(path).exists()
@@ -1,16 +1,87 @@
 from __future__ import annotations
 
-import json
+import hashlib
+import os
 import re
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
 
-from rank_bm25 import BM25Okapi
+import numpy as np
+import orjson
+
+from app.services.fs import decode_text
+
+try:  # Optional (the "jit" extra): compiled score accumulation for large corpora.
+    from numba import njit
+except ImportError:  # pragma: no cover - depends on the environment
+    njit = None
+
+# Okapi BM25 parameters (same defaults rank_bm25 used).
+_K1 = 1.5
+_B = 0.75
+# Bump when the on-disk index layout or scoring changes; older sidecars are rebuilt.
+_INDEX_VERSION = 3
+# Stop-term truncation needs a corpus this large: in a small KB nearly every term
+# clears any df ratio, and there are no long posting lists worth dropping anyway.
+_STOP_MIN_DOCS = 1_000
+# Ranked results kept for repeated queries; dropped whenever the index changes.
+_QUERY_CACHE_SIZE = 256
+# Below this many docs the NumPy path is already fast and skips JIT warm-up.
+_JIT_MIN_DOCS = 20_000
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9_\-]+")
 
 
 def _tokenize(text: str) -> list[str]:
     # Simple tokenizer: lowercase words + numbers
-    return re.findall(r"[a-z0-9_\-]+", text.lower())
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _add_postings_numpy(
+    out: np.ndarray,
+    offsets: np.ndarray,
+    docs: np.ndarray,
+    scores: np.ndarray,
+    term: int,
+    weight: float,
+    seen_only: bool,
+) -> None:
+    lo, hi = offsets[term], offsets[term + 1]
+    d, s = docs[lo:hi], scores[lo:hi]
+    if seen_only:
+        keep = out[d] > 0
+        d, s = d[keep], s[keep]
+    # A term lists each doc once, so plain fancy-index += is safe here.
+    out[d] += weight * s
+
+
+if njit is not None:
+
+    @njit(cache=True, nogil=True)
+    def _add_postings_jit(out, offsets, docs, scores, term, weight, seen_only):  # pragma: no cover
+        # Serial on purpose: terms share docs, so a prange over postings of several
+        # terms would race on ``out`` without per-thread buffers.
+        for i in range(offsets[term], offsets[term + 1]):
+            d = docs[i]
+            if not seen_only or out[d] > 0:
+                out[d] += weight * scores[i]
+
+else:
+    _add_postings_jit = None
+
+
+def _top_k(doc_idx: np.ndarray, doc_scores: np.ndarray, k: int) -> np.ndarray:
+    """Best ``k`` of ``doc_idx`` by score, ties broken by doc order."""
+    if doc_idx.size > k:
+        # O(hits) selection of the k best, then sort just those.
+        keep = np.argpartition(-doc_scores, k - 1)[:k]
+        doc_idx, doc_scores = doc_idx[keep], doc_scores[keep]
+    return doc_idx[np.lexsort((doc_idx, -doc_scores))]
 
 
 @dataclass(frozen=True)
@@ -23,87 +94,336 @@ class KbDoc:
 class KnowledgeBase:
     """A tiny local knowledge base using BM25 (no heavy models required).
 
-    Important: BM25Okapi from rank_bm25 is not safe with an empty corpus (it can
-    raise ZeroDivisionError). We treat "no documents" as a first-class state and
-    simply return no results for search().
+    Documents are indexed into per-term posting lists holding each matching doc's
+    precomputed BM25 contribution (Lucene idf), so a query only touches the postings
+    of its own terms. Postings are stored CSR-style: term ``i`` owns
+    ``offsets[i]:offsets[i + 1]`` of the flat doc and score arrays. An empty corpus,
+    or one without any tokens, is a first-class state: search() simply returns no
+    results.
+
+    save() also writes the built index to a sidecar directory (``kb.index`` next to
+    ``kb.json``); load() memory-maps it instead of re-tokenizing when it was written
+    for exactly the current docs file.
+
+    Terms found in more than ``stop_df_ratio`` of the docs are left out of the index
+    (once there are at least ``_STOP_MIN_DOCS``): they barely change the ranking but
+    own the longest posting lists. Pass ``None`` to index every term.
     """
 
-    def __init__(self, store_path: str) -> None:
+    def __init__(self, store_path: str, *, stop_df_ratio: float | None = 0.02) -> None:
         self._store_path = Path(store_path)
+        self._stop_df_ratio = stop_df_ratio
         self._docs: list[KbDoc] = []
-        self._bm25: BM25Okapi | None = None
+        self._id_to_idx: dict[str, int] = {}  # doc_id -> position in _docs
+        # doc_id -> blake2b of the file bytes it was ingested from (ingest_folder only).
+        self._hashes: dict[str, str] = {}
+        self._vocab: dict[str, int] = {}  # term -> row in the CSR postings
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_scores = np.zeros(0, dtype=np.float32)
+        self._max_scores = np.zeros(0, dtype=np.float32)  # term -> best single-doc score
+        self._stop_terms: frozenset[str] = frozenset()
+        # Per-thread score accumulator reused across queries (see _score_buffer).
+        self._local = threading.local()
+        self._query_cache: OrderedDict[tuple[tuple[str, ...], int], tuple[KbDoc, ...]] = (
+            OrderedDict()
+        )
+        self._query_cache_lock = threading.Lock()
+        self._index_gen = 0  # bumped on every index change; stale results are not cached
+        # doc_id -> term frequencies of that doc's text; reused across rebuilds.
+        self._term_freqs: dict[str, Counter[str]] = {}
 
     def load(self) -> None:
+        self._term_freqs = {}
         if not self._store_path.exists():
             self._docs = []
-            self._bm25 = None
+            self._id_to_idx = {}
+            self._hashes = {}
+            self._rebuild()
             return
 
-        data = json.loads(self._store_path.read_text(encoding="utf-8"))
+        data = orjson.loads(self._store_path.read_bytes())
         self._docs = [KbDoc(**d) for d in data.get("docs", [])]
-        self._rebuild()
+        self._hashes = data.get("hashes", {})
+        self._id_to_idx = {}
+        for i, d in enumerate(self._docs):
+            self._id_to_idx.setdefault(d.doc_id, i)  # first wins, as the old scan did
+        if not self._load_index():
+            self._rebuild()
 
     def save(self) -> None:
-        payload = {"docs": [d.__dict__ for d in self._docs]}
+        payload = {"docs": [d.__dict__ for d in self._docs], "hashes": self._hashes}
         self._store_path.parent.mkdir(parents=True, exist_ok=True)
-        self._store_path.write_text(
-            json.dumps(payload, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+        self._store_path.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+        self._save_index()
+
+    @property
+    def _index_dir(self) -> Path:
+        return self._store_path.with_suffix(".index")
+
+    def _docs_fingerprint(self) -> list[int]:
+        st = self._store_path.stat()
+        return [st.st_size, st.st_mtime_ns]
+
+    def _save_index(self) -> None:
+        index_dir = self._index_dir
+        index_dir.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "offsets": self._offsets,
+            "docs": self._post_docs,
+            "scores": self._post_scores,
+            "max_scores": self._max_scores,
+        }
+        meta = {
+            "version": _INDEX_VERSION,
+            "n_docs": len(self._docs),
+            "docs_file": self._docs_fingerprint(),
+            "stop_df_ratio": self._stop_df_ratio,
+        }
+        # Write-then-rename: a live mmap of the previous files keeps its old inode,
+        # and meta.json goes last so a half-written index is never picked up.
+        for name, arr in arrays.items():
+            tmp = index_dir / f"{name}.npy.tmp"
+            with tmp.open("wb") as f:
+                np.save(f, np.ascontiguousarray(arr))
+            os.replace(tmp, index_dir / f"{name}.npy")
+        lists = {"vocab": list(self._vocab), "stop": sorted(self._stop_terms), "meta": meta}
+        for name, obj in lists.items():
+            tmp = index_dir / f"{name}.json.tmp"
+            tmp.write_bytes(orjson.dumps(obj))
+            os.replace(tmp, index_dir / f"{name}.json")
+
+    def _load_index(self) -> bool:
+        index_dir = self._index_dir
+        try:
+            meta = orjson.loads((index_dir / "meta.json").read_bytes())
+            if (
+                meta.get("version") != _INDEX_VERSION
+                or meta.get("n_docs") != len(self._docs)
+                or meta.get("docs_file") != self._docs_fingerprint()
+                or meta.get("stop_df_ratio") != self._stop_df_ratio
+            ):
+                return False
+            vocab = orjson.loads((index_dir / "vocab.json").read_bytes())
+            stop = orjson.loads((index_dir / "stop.json").read_bytes())
+            offsets = np.load(index_dir / "offsets.npy", mmap_mode="r")
+            docs = np.load(index_dir / "docs.npy", mmap_mode="r")
+            scores = np.load(index_dir / "scores.npy", mmap_mode="r")
+            max_scores = np.load(index_dir / "max_scores.npy")
+        except (OSError, ValueError):  # orjson.JSONDecodeError is a ValueError
+            return False
+        if (
+            len(offsets) != len(vocab) + 1
+            or len(docs) != len(scores)
+            or len(max_scores) != len(vocab)
+        ):
+            return False
+        self._clear_query_cache()
+        self._vocab = {t: i for i, t in enumerate(vocab)}
+        self._stop_terms = frozenset(stop)
+        self._offsets, self._post_docs, self._post_scores = offsets, docs, scores
+        self._max_scores = max_scores
+        return True
 
     def ingest_folder(self, folder: str, glob: str = "*.md") -> int:
         base = Path(folder)
         count = 0
+        changed = False
+        hashes_changed = False
         for p in base.rglob(glob):
             if not p.is_file():
                 continue
             doc_id = str(p)
-            title = p.name
-            text = p.read_text(encoding="utf-8")
-            self.upsert(doc_id=doc_id, title=title, text=text)
+            data = p.read_bytes()
             count += 1
-        self.save()
+            # Hashing is far cheaper than decoding and comparing an unchanged file.
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            if self._hashes.get(doc_id) == digest and doc_id in self._id_to_idx:
+                continue
+            text = decode_text(data)
+            changed |= self._put(KbDoc(doc_id=doc_id, title=p.name, text=text))
+            self._hashes[doc_id] = digest
+            hashes_changed = True
+        # One rebuild and save for the whole folder instead of one per file, and none
+        # at all when every file matches what is already indexed.
+        if changed:
+            self._rebuild()
+        if changed or hashes_changed:
+            self.save()
         return count
 
     def upsert(self, doc_id: str, title: str, text: str) -> None:
-        for i, d in enumerate(self._docs):
-            if d.doc_id == doc_id:
-                self._docs[i] = KbDoc(doc_id=doc_id, title=title, text=text)
-                self._rebuild()
-                return
-        self._docs.append(KbDoc(doc_id=doc_id, title=title, text=text))
-        self._rebuild()
+        self._hashes.pop(doc_id, None)  # text no longer comes from the hashed file
+        if self._put(KbDoc(doc_id=doc_id, title=title, text=text)):
+            self._rebuild()
+
+    def _put(self, doc: KbDoc) -> bool:
+        """Insert or replace ``doc`` without rebuilding; return whether the text changed."""
+        i = self._id_to_idx.get(doc.doc_id)
+        if i is None:
+            self._id_to_idx[doc.doc_id] = len(self._docs)
+            self._docs.append(doc)
+            return True
+        old = self._docs[i]
+        self._docs[i] = doc
+        if old.text == doc.text:
+            return False
+        self._term_freqs.pop(doc.doc_id, None)
+        return True
 
     def search(self, query: str, k: int = 4) -> list[KbDoc]:
-        # No docs => no results (and avoid BM25 initialization issues).
-        if not self._docs:
-            return []
+        """Return up to ``k`` docs sharing at least one term with ``query``, best first."""
+        return self.search_tokens(_tokenize(query), k)
+
+    def search_batch(self, queries: Sequence[str], k: int = 4) -> list[list[KbDoc]]:
+        """search() for each query, in order, sharing this thread's score buffer."""
+        return [self.search_tokens(tokens, k) for tokens in map(_tokenize, queries)]
 
-        tokens = _tokenize(query)
-        if not tokens:
+    def search_tokens(self, tokens: Iterable[str], k: int = 4) -> list[KbDoc]:
+        """search() for a query that is already split into lower-cased tokens."""
+        if not self._vocab or k <= 0:
             return []
 
-        if self._bm25 is None:
-            self._rebuild()
+        key = (tuple(tokens), k)
+        with self._query_cache_lock:
+            hit = self._query_cache.get(key)
+            if hit is not None:
+                self._query_cache.move_to_end(key)
+                return list(hit)
+            gen = self._index_gen
+        ranked = self._rank(key[0], k)
+        with self._query_cache_lock:
+            if gen != self._index_gen:
+                return ranked
+            self._query_cache[key] = tuple(ranked)
+            if len(self._query_cache) > _QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return ranked
+
+    def _clear_query_cache(self) -> None:
+        with self._query_cache_lock:
+            self._index_gen += 1
+            self._query_cache.clear()
 
-        if self._bm25 is None:
+    def _rank(self, tokens: Sequence[str], k: int) -> list[KbDoc]:
+        stop = self._stop_terms
+        counts = Counter(
+            i for t in tokens if t not in stop and (i := self._vocab.get(t)) is not None
+        )
+        if not counts:
             return []
 
-        scores = self._bm25.get_scores(tokens)
-        ranked = sorted(range(len(self._docs)), key=lambda i: scores[i], reverse=True)[:k]
+        if len(counts) == 1:
+            # One distinct term: its postings already are the doc scores (repeats only
+            # scale them), so rank the posting slice without an N-wide buffer.
+            (term,) = counts
+            lo, hi = self._offsets[term], self._offsets[term + 1]
+            ranked = _top_k(self._post_docs[lo:hi], self._post_scores[lo:hi], k)
+            return [self._docs[i] for i in ranked]
+
+        n = len(self._docs)
+        add = (
+            _add_postings_jit
+            if _add_postings_jit is not None and n >= _JIT_MIN_DOCS
+            else _add_postings_numpy
+        )
+
+        # MaxScore: visit terms by their best possible contribution. Once the k-th best
+        # partial score beats everything the remaining terms could add, no unseen doc
+        # can reach the top k, so the rest only update docs that already scored.
+        terms = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        bounds = weights * self._max_scores[terms]
+        order = np.argsort(-bounds, kind="stable")
+        terms, weights = terms[order], weights[order]
+        remaining = np.cumsum(bounds[order][::-1])[::-1]  # remaining[j] = sum(bounds[j:])
+
+        # Only docs in the fully-added terms' postings can be non-zero, so selection and
+        # the final reset touch just those instead of the whole buffer.
+        scores = self._score_buffer(n)
+        seen: list[np.ndarray] = []
+        try:
+            seen_only = False
+            for j in range(len(terms)):
+                term = int(terms[j])
+                if not seen_only:
+                    seen.append(self._post_docs[self._offsets[term] : self._offsets[term + 1]])
+                add(
+                    scores,
+                    self._offsets,
+                    self._post_docs,
+                    self._post_scores,
+                    term,
+                    float(weights[j]),
+                    seen_only,
+                )
+                if seen_only:
+                    continue
+                hits = np.unique(np.concatenate(seen))
+                if j + 1 < len(terms) and hits.size > k:
+                    kth = np.partition(scores[hits], hits.size - k)[hits.size - k]
+                    seen_only = bool(kth > remaining[j + 1])
+            ranked = _top_k(hits, scores[hits], k)
+        finally:
+            for docs in seen:
+                scores[docs] = 0.0
         return [self._docs[i] for i in ranked]
 
+    def _score_buffer(self, n: int) -> np.ndarray:
+        """This thread's all-zero accumulator for ``n`` docs; callers must re-zero it."""
+        buf = getattr(self._local, "scores", None)
+        if buf is None or len(buf) != n:
+            buf = self._local.scores = np.zeros(n, dtype=np.float32)
+        return buf
+
     def _rebuild(self) -> None:
-        # rank_bm25 can crash on degenerate corpora; keep it defensive.
-        corpus = [_tokenize(d.text) for d in self._docs if d.text.strip()]
-        if not corpus:
-            self._bm25 = None
+        self._clear_query_cache()
+        self._vocab = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_scores = np.zeros(0, dtype=np.float32)
+        self._max_scores = np.zeros(0, dtype=np.float32)
+        self._stop_terms = frozenset()
+        n = len(self._docs)
+        term_docs: dict[str, list[int]] = {}
+        term_tfs: dict[str, list[int]] = {}
+        doc_lens = np.zeros(n, dtype=np.float32)
+        for i, d in enumerate(self._docs):
+            freqs = self._term_freqs.get(d.doc_id)
+            if freqs is None:
+                freqs = self._term_freqs[d.doc_id] = Counter(_tokenize(d.text))
+            doc_lens[i] = freqs.total()
+            for t, tf in freqs.items():
+                term_docs.setdefault(t, []).append(i)
+                term_tfs.setdefault(t, []).append(tf)
+        if self._stop_df_ratio is not None and n >= _STOP_MIN_DOCS:
+            limit = self._stop_df_ratio * n
+            self._stop_terms = frozenset(t for t, v in term_docs.items() if len(v) > limit)
+            for t in self._stop_terms:
+                del term_docs[t], term_tfs[t]
+        if not term_docs:
             return
 
-        try:
-            self._bm25 = BM25Okapi(corpus)
-            # Some degenerate cases can still yield empty idf and crash later.
-            if not getattr(self._bm25, "idf", None):
-                self._bm25 = None
-        except ZeroDivisionError:
-            self._bm25 = None
+        df = np.fromiter((len(v) for v in term_docs.values()), dtype=np.int64, count=len(term_docs))
+        offsets = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+        total = int(offsets[-1])
+        docs = np.fromiter(chain.from_iterable(term_docs.values()), dtype=np.int32, count=total)
+        tf = np.fromiter(chain.from_iterable(term_tfs.values()), dtype=np.float32, count=total)
+
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # Per-doc length normalisation, shared by every term's postings.
+        norm = (_K1 * (1.0 - _B + _B * doc_lens / doc_lens.mean())).astype(np.float32)
+        # idf * tf * (k1 + 1) / (tf + norm[d]), evaluated in place over all postings.
+        scores = np.repeat(idf, df)
+        scores *= tf
+        scores *= np.float32(_K1 + 1.0)
+        denom = norm[docs]
+        denom += tf
+        scores /= denom
+
+        self._vocab = {t: i for i, t in enumerate(term_docs)}
+        self._offsets = offsets
+        self._post_docs = docs
+        self._post_scores = scores
+        self._max_scores = np.maximum.reduceat(self._post_scores, offsets[:-1])
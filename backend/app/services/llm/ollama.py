@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-import json
+from collections.abc import Iterator
 from dataclasses import dataclass
 from typing import Any
 
 import httpx
+import orjson
+
+# Keep warm connections around between generations; several workers/threads may share
+# one Ollama host, so allow more than httpx's default of 10.
+_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0)
 
 
 @dataclass(frozen=True)
@@ -22,7 +27,21 @@ class OllamaClient:
 
     def __init__(self, base_url: str, *, timeout_seconds: int = 1800) -> None:
         timeout = httpx.Timeout(timeout_seconds, connect=10.0)
-        self._client = httpx.Client(base_url=base_url.rstrip("/"), timeout=timeout)
+        self._client = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            # Retries connection failures only (e.g. Ollama restarting), never a sent request.
+            transport=httpx.HTTPTransport(limits=_LIMITS, retries=1),
+        )
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self) -> OllamaClient:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
 
     def generate(
         self,
@@ -33,7 +52,32 @@ class OllamaClient:
         format: Any | None = None,
         options: dict[str, Any] | None = None,
     ) -> OllamaResponse:
-        payload: dict[str, Any] = {"model": model, "prompt": prompt, "stream": False}
+        # Streamed even when the caller wants the whole text: pieces are decoded as the
+        # model produces them instead of buffering one large body and parsing it at the end.
+        parts: list[str] = []
+        last: dict[str, Any] = {}
+        for chunk in self.generate_stream(
+            model=model, prompt=prompt, system=system, format=format, options=options
+        ):
+            parts.append(str(chunk.get("response", "")))
+            last = chunk
+        return OllamaResponse(
+            response="".join(parts),
+            model=last.get("model"),
+            created_at=last.get("created_at"),
+        )
+
+    def generate_stream(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        format: Any | None = None,
+        options: dict[str, Any] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield the NDJSON chunks of a streamed /api/generate call, ending with ``done``."""
+        payload: dict[str, Any] = {"model": model, "prompt": prompt, "stream": True}
         if system:
             payload["system"] = system
         if format is not None:
@@ -41,18 +85,21 @@ class OllamaClient:
         if options:
             payload["options"] = options
 
-        r = self._client.post("/api/generate", json=payload)
-        r.raise_for_status()
-        data = r.json()
-        return OllamaResponse(
-            response=str(data.get("response", "")),
-            model=data.get("model"),
-            created_at=data.get("created_at"),
-        )
+        with self._client.stream("POST", "/api/generate", json=payload) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                chunk = orjson.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                yield chunk
+                if chunk.get("done"):
+                    return
 
     @staticmethod
     def try_parse_json(text: str) -> dict[str, Any] | None:
         try:
-            return json.loads(text)
+            return orjson.loads(text)
         except Exception:
             return None
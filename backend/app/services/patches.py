@@ -1,15 +1,96 @@
 from __future__ import annotations
 
+import copy
+import hashlib
+import importlib.util
+import io
+import json
+import os
 import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from typing import Any
 
 from app.core.config import settings
 from app.services.code_context import build_code_context
 from app.services.commands import CommandRunner
-from app.services.diffing import snapshot_files, unified_diff
+from app.services.diffing import unified_diff
 from app.services.llm.ollama import OllamaClient
 
+# Diff-handling patterns run on every proposal and repair attempt; compile them once.
+_PATCH_WRAP_RE = re.compile(r"<patch>\s*(.*?)\s*</patch>", re.DOTALL | re.IGNORECASE)
+_FENCE_OPEN_RE = re.compile(r"^```[a-zA-Z0-9_-]*\n")
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# Start of whatever ends a hunk body: the next hunk header or a file header line.
+_HUNK_END_RE = re.compile(
+    r"^(?:@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@|diff --git |--- |\+\+\+ )", re.MULTILINE
+)
+_PLUS_B_RE = re.compile(r"^\+\+\+\s+b/(.+)", re.MULTILINE)
+_PLUS_RE = re.compile(r"^\+\+\+\s+(.+)", re.MULTILINE)
+_ZERO_HUNK_RE = re.compile(r"^@@ -0,0 \+", re.MULTILINE)
+_FILE_SECTION_RE = re.compile(r"^(?=diff --git |--- a/)", re.MULTILINE)
+_HUNK_START_RE = re.compile(r"^@@", re.MULTILINE)
+_TRAILING_COMMA_OBJ_RE = re.compile(r",\s*}")
+_TRAILING_COMMA_ARR_RE = re.compile(r",\s*]")
+# Added-line payloads (line ending kept); split on "\n" only, as git does.
+_ADDED_LINE_RE = re.compile(r"^\+([^\n]*\n?)", re.MULTILINE)
+
+_UNSET = object()
+
+# Vendored, generated and tool directories never hold the workspace's own code.
+_SCAN_SKIP_DIRS = frozenset(
+    {".git", "node_modules", ".venv", "venv", "__pycache__", "dist", "build", ".tox"}
+)
+
+
+def _first_py_mentioning(root: Path, needles: tuple[bytes, ...]) -> Path | None:
+    """First ``*.py`` under ``root`` containing any of ``needles``, in rglob order.
+
+    One os.scandir walk (files of a directory before its subdirectories, symlinked
+    dirs not followed) that prunes _SCAN_SKIP_DIRS and stops at the first hit. Files
+    are checked as raw bytes: the needles are ASCII, so no decode is needed.
+    """
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        subdirs: list[str] = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in _SCAN_SKIP_DIRS:
+                        subdirs.append(entry.path)
+                    continue
+                if not entry.name.endswith(".py"):
+                    continue
+                with open(entry.path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            if any(n in data for n in needles):
+                return Path(entry.path)
+        stack.extend(reversed(subdirs))
+    return None
+
+
+# Rule-based pricing rewrites (tinyshop sample); used by every propose/apply of the rule.
+_APPLY_DISCOUNT_RE = re.compile(
+    r"def apply_discount\(([^)]*)\)\s*->\s*int:\s*\n((?:[ \t][^\n]*\n|\n)*)"
+)
+_APPLY_TAX_RE = re.compile(r"def apply_tax\(([^)]*)\)\s*->\s*int:\s*\n((?:[ \t][^\n]*\n|\n)*)")
+_TAX_CALL_RE = re.compile(r"total_with_tax\s*=\s*apply_tax\s*\(\s*subtotal\s*,")
+_TAX_AMOUNT_RE = re.compile(r"tax_amount\s*=\s*total_with_tax\s*-\s*subtotal\b")
+# Bug-fix intents and failing-test hints ("tests failed" is covered by "failed").
+# Plain substring scans beat a compiled IGNORECASE alternation here by ~8x.
+_FIX_KEYWORDS = ("discount", "coupon", "rounding", "fix", "failing", "assertion", "failed")
+
 
 @dataclass(frozen=True)
 class PatchProposal:
@@ -29,6 +110,7 @@ class WorkspacePatcher:
 
     def __init__(self, workspace_path: str) -> None:
         self._root = Path(workspace_path)
+        self._cart_file: Path | None | object = _UNSET
 
     def propose(
         self,
@@ -39,18 +121,17 @@ class WorkspacePatcher:
         previous_error: str | None = None,
     ) -> PatchProposal:
         """Return a patch proposal based on the ticket + tool output."""
-        combined = (ticket_text + "\n" + signals_text).lower()
+        # Lowered separately: no keyword spans the joining newline, and signals_text can
+        # be a whole test log, so skip building a concatenated copy of it first.
+        parts = (ticket_text.lower(), signals_text.lower())
 
         # Route by ticket intent first (health requests should not be hijacked by generic failing-test text).
-        if "health" in combined:
+        if any("health" in p for p in parts):
             return self._proposal_add_health()
 
-        # Then apply bug-fix heuristics.
-        if any(k in combined for k in ["discount", "coupon", "rounding", "fix"]):
-            return self._proposal_fix_discount_rounding()
-
-        # Fallback: if we only know tests are failing, use discount rule for tinyshop sample.
-        if any(k in combined for k in ["failing", "assertion", "tests failed", "failed"]):
+        # Then bug-fix heuristics; if we only know tests are failing, the discount rule
+        # for the tinyshop sample is the fallback, so both keyword sets share one scan.
+        if any(k in p for p in parts for k in _FIX_KEYWORDS):
             return self._proposal_fix_discount_rounding()
 
         return PatchProposal(
@@ -73,14 +154,11 @@ class WorkspacePatcher:
     # ---- proposals (diff previews) ----
 
     def _proposal_add_health(self) -> PatchProposal:
-        before = snapshot_files(str(self._root), ["*.py"])
-        self._apply_add_health(dry_run=True)
+        rewrites = [(self._health_file(), self._compute_add_health)]
         # For tinyshop sample we also include pricing fix to keep post-checks green.
         if self._find_cart_file() is not None:
-            self._apply_fix_discount_rounding(dry_run=True)
-        after = snapshot_files(str(self._root), ["*.py"])
-        self._revert_from_snapshot(before)
-        diff = unified_diff(before, after)
+            rewrites.append((self._pricing_file(), self._compute_fix_discount_rounding))
+        diff = self._preview(rewrites)
         return PatchProposal(
             title="Add /health endpoint",
             rationale=(
@@ -91,11 +169,7 @@ class WorkspacePatcher:
         )
 
     def _proposal_fix_discount_rounding(self) -> PatchProposal:
-        before = snapshot_files(str(self._root), ["*.py"])
-        self._apply_fix_discount_rounding()
-        after = snapshot_files(str(self._root), ["*.py"])
-        self._revert_from_snapshot(before)
-        diff = unified_diff(before, after)
+        diff = self._preview([(self._pricing_file(), self._compute_fix_discount_rounding)])
         return PatchProposal(
             title="Fix discount calculation rounding",
             rationale=(
@@ -107,18 +181,42 @@ class WorkspacePatcher:
             diff=diff,
         )
 
+    def _preview(self, rewrites: list[tuple[Path, Callable[[str], str]]]) -> str:
+        """Diff of the given rewrites, computed in memory; the workspace is not touched."""
+        before: dict[str, str] = {}
+        after: dict[str, str] = {}
+        for p, rewrite in rewrites:
+            rel = str(p.relative_to(self._root))
+            if rel not in before:
+                before[rel] = after[rel] = p.read_text(encoding="utf-8")
+            after[rel] = rewrite(after[rel])
+        return unified_diff(before, after)
+
     # ---- apply implementations ----
 
-    def _apply_add_health(self, dry_run: bool = False) -> None:
-        p = self._root / "tinyshop" / "main.py"
+    def _health_file(self) -> Path:
+        return self._root / "tinyshop" / "main.py"
+
+    def _apply_add_health(self) -> None:
+        p = self._health_file()
         text = p.read_text(encoding="utf-8")
+        new_text = self._compute_add_health(text)
+        if new_text != text:
+            p.write_text(new_text, encoding="utf-8")
+
+    def _compute_add_health(self, text: str) -> str:
         if '@app.get("/health")' in text:
-            return
+            return text
         insert = '\n\n@app.get("/health")\ndef health():\n    return {"status": "ok"}\n'
-        p.write_text(text + insert, encoding="utf-8")
+        return text + insert
 
     def _find_cart_file(self) -> "Path | None":
-        """Find the main cart/pricing implementation file in the workspace."""
+        """Find the main cart/pricing implementation file in the workspace (memoized)."""
+        if self._cart_file is _UNSET:
+            self._cart_file = self._locate_cart_file()
+        return self._cart_file  # type: ignore[return-value]
+
+    def _locate_cart_file(self) -> "Path | None":
         candidates = [
             self._root / "src" / "cart.py",
             self._root / "tinyshop" / "pricing.py",
@@ -128,29 +226,22 @@ class WorkspacePatcher:
         for p in candidates:
             if p.exists():
                 return p
-        for py in self._root.rglob("*.py"):
-            try:
-                t = py.read_text(encoding="utf-8", errors="ignore")
-                if "apply_discount" in t or "apply_tax" in t:
-                    return py
-            except Exception:
-                pass
-        return None
-
-    def _apply_fix_discount_rounding(self, dry_run: bool = False) -> None:
-        import re as _re
+        return _first_py_mentioning(self._root, (b"apply_discount", b"apply_tax"))
 
+    def _pricing_file(self) -> Path:
         p = self._find_cart_file()
-        if p is None:
-            p = self._root / "tinyshop" / "pricing.py"
+        return self._root / "tinyshop" / "pricing.py" if p is None else p
 
+    def _apply_fix_discount_rounding(self) -> None:
+        p = self._pricing_file()
         text = p.read_text(encoding="utf-8")
+        new_text = self._compute_fix_discount_rounding(text)
+        if new_text != text:
+            p.write_text(new_text, encoding="utf-8")
 
+    def _compute_fix_discount_rounding(self, text: str) -> str:
         def _rewrite_apply_discount(src: str) -> str:
-            m = _re.search(
-                r"def apply_discount\(([^)]*)\)\s*->\s*int:\s*\n((?:[ \t][^\n]*\n|\n)*)",
-                src,
-            )
+            m = _APPLY_DISCOUNT_RE.search(src)
             if not m:
                 return src
             sig = m.group(1)
@@ -175,10 +266,7 @@ class WorkspacePatcher:
             )
 
         def _rewrite_apply_tax(src: str) -> str:
-            m = _re.search(
-                r"def apply_tax\(([^)]*)\)\s*->\s*int:\s*\n((?:[ \t][^\n]*\n|\n)*)",
-                src,
-            )
+            m = _APPLY_TAX_RE.search(src)
             if not m:
                 return src
             sig = m.group(1)
@@ -198,26 +286,15 @@ class WorkspacePatcher:
 
         def _rewrite_calculate_final_price(src: str) -> str:
             # Fix: tax should be calculated on after_discount, not subtotal
-            fixed = _re.sub(
-                r"total_with_tax\s*=\s*apply_tax\s*\(\s*subtotal\s*,",
-                "total_with_tax = apply_tax(after_discount,",
-                src,
-            )
-            fixed = _re.sub(
-                r"tax_amount\s*=\s*total_with_tax\s*-\s*subtotal\b",
-                "tax_amount = total_with_tax - after_discount",
-                fixed,
-            )
+            if "total_with_tax" not in src:
+                return src  # both patterns start with it; one scan instead of two
+            fixed = _TAX_CALL_RE.sub("total_with_tax = apply_tax(after_discount,", src)
+            fixed = _TAX_AMOUNT_RE.sub("tax_amount = total_with_tax - after_discount", fixed)
             return fixed
 
         new_text = _rewrite_apply_discount(text)
         new_text = _rewrite_apply_tax(new_text)
-        new_text = _rewrite_calculate_final_price(new_text)
-        p.write_text(new_text, encoding="utf-8")
-
-    def _revert_from_snapshot(self, snapshot: dict[str, str]) -> None:
-        for rel, content in snapshot.items():
-            (self._root / rel).write_text(content, encoding="utf-8")
+        return _rewrite_calculate_final_price(new_text)
 
 
 def _strip_patch_wrappers(diff_text: str) -> str:
@@ -225,13 +302,19 @@ def _strip_patch_wrappers(diff_text: str) -> str:
 
     # Common SWE-bench format uses <patch> ... </patch>
     if "<patch>" in text and "</patch>" in text:
-        m = re.search(r"<patch>\s*(.*?)\s*</patch>", text, flags=re.DOTALL | re.IGNORECASE)
+        m = _PATCH_WRAP_RE.search(text)
         if m:
             text = m.group(1).strip()
 
-    # Remove markdown code fences if present
-    text = re.sub(r"^```[a-zA-Z0-9_-]*\n", "", text)
-    text = re.sub(r"```\s*$", "", text)
+    # Remove markdown code fences if present. Both are anchored to an end of the text,
+    # so check those ends instead of letting a regex scan the whole payload.
+    if text.startswith("```"):
+        m = _FENCE_OPEN_RE.match(text)
+        if m:
+            text = text[m.end() :]
+    stripped = text.rstrip()
+    if stripped.endswith("```"):
+        text = stripped[:-3]
 
     return text.strip()
 
@@ -257,53 +340,96 @@ def _sanitize_unified_diff(diff_text: str) -> str:
     t = t.replace("\r\n", "\n").replace("\r", "\n")
     if not t.endswith("\n"):
         t += "\n"
-    lines = t.splitlines(keepends=True)
-
-    out: list[str] = []
-    i = 0
-    hunk_re = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
-
-    def _is_file_header(line: str) -> bool:
-        return line.startswith("diff --git ") or line.startswith("--- ") or line.startswith("+++ ")
 
-    while i < len(lines):
-        line = lines[i]
-        m = hunk_re.match(line)
+    # Single pass over "\n" offsets (t ends with one): lines outside hunk headers are
+    # copied as-is, and each hunk body is counted in bulk and copied as one slab.
+    out = io.StringIO()
+    pos = 0
+    end = len(t)
+    while pos < end:
+        nl = t.index("\n", pos) + 1
+        line = t[pos:nl]
+        m = _HUNK_RE.match(line)
         if not m:
-            out.append(line)
-            i += 1
+            out.write(line)
+            pos = nl
             continue
 
         old_start = int(m.group(1))
         new_start = int(m.group(3))
 
-        # Count hunk body lines until next hunk or next file header.
-        old_count = 0
-        new_count = 0
-        j = i + 1
-        while j < len(lines):
-            body = lines[j]
-            if hunk_re.match(body) or _is_file_header(body):
-                break
-            if body.startswith("\\"):  # e.g. '\\ No newline at end of file'
-                j += 1
-                continue
-            if body.startswith("-") and not body.startswith("--- "):
-                old_count += 1
-            elif body.startswith("+") and not body.startswith("+++ "):
-                new_count += 1
-            else:
-                # context line (starts with space or other)
-                old_count += 1
-                new_count += 1
-            j += 1
+        # The body runs until the next hunk or file header, so "--- "/"+++ " lines never
+        # occur inside it: every line starting with "-"/"+" is a removal/addition, and
+        # every line is counted from the "\n"-prefixed occurrences of its first char.
+        stop = _HUNK_END_RE.search(t, nl)
+        body_end = stop.start() if stop else end
+        body = "\n" + t[nl:body_end]
+        minus = body.count("\n-")
+        plus = body.count("\n+")
+        no_newline = body.count("\n\\")  # e.g. '\\ No newline at end of file'
+        context = body.count("\n") - 1 - minus - plus - no_newline
+        old_count = minus + context
+        new_count = plus + context
 
         # Preserve any trailing function context after the @@ ... @@ token.
         rest = line[m.end() :]
-        out.append(f"@@ -{old_start},{old_count} +{new_start},{new_count} @@" + rest)
-        i += 1
+        out.write(f"@@ -{old_start},{old_count} +{new_start},{new_count} @@" + rest)
+        out.write(t[nl:body_end])
+        pos = body_end
+
+    return out.getvalue()
+
+
+class _ApplyCheckCache:
+    """Bounded LRU of ``git apply --check`` results, keyed by the sanitized diff.
+
+    Repair rounds often re-check a diff that sanitizes to the same text; the workspace
+    does not change while a patcher is proposing, so the earlier verdict still holds.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self._maxsize = maxsize
+        self._results: OrderedDict[bytes, tuple[bool, str]] = OrderedDict()
+
+    @staticmethod
+    def key(diff_text: str) -> bytes:
+        return hashlib.blake2b(diff_text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> tuple[bool, str] | None:
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        return result
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def put(self, key: bytes, result: tuple[bool, str]) -> tuple[bool, str]:
+        self._results[key] = result
+        if len(self._results) > self._maxsize:
+            self._results.popitem(last=False)
+        return result
+
 
-    return "".join(out)
+def _add_only_file_contents(diff_text: str) -> Iterator[tuple[str, str]]:
+    """Yield ``(path, content)`` for each file section of ``diff_text`` with a -0,0 hunk.
+
+    ``content`` is the section's added lines joined, i.e. the whole file the hunk
+    describes. Each section is classified by a few C-level searches and its added
+    lines are pulled with one findall, so no Python code runs per diff line.
+    """
+    for section in _FILE_SECTION_RE.split(diff_text):
+        m_plus = _PLUS_B_RE.search(section) or _PLUS_RE.search(section)
+        if not m_plus:
+            continue
+        rel = m_plus.group(1).strip()
+        if rel in {"/dev/null", "dev/null"} or not _ZERO_HUNK_RE.search(section):
+            continue
+        # The "+++" header comes before the first hunk, so start there.
+        hunks = section[_HUNK_START_RE.search(section).start() :]
+        added_lines = _ADDED_LINE_RE.findall(hunks)
+        if added_lines:
+            yield rel, "".join(added_lines)
 
 
 def _looks_like_unified_diff(text: str) -> bool:
@@ -339,6 +465,7 @@ class OllamaWorkspacePatcher:
             or settings.git_command_seconds
             or settings.max_command_seconds,
         )
+        self._apply_checks = _ApplyCheckCache()
         self._ollama = OllamaClient(
             settings.ollama_base_url, timeout_seconds=settings.ollama_timeout_seconds
         )
@@ -508,14 +635,8 @@ class OllamaWorkspacePatcher:
                 diff=prop.diff,
             )
 
-        def _validate_or_repair(prop: PatchProposal) -> tuple[PatchProposal, bool, str]:
-            """Return (proposal, ok, err) after validating with git apply --check (and one repair attempt)."""
-            if not prop.diff or prop.diff.strip() in {"(no changes)", "(no-op)", "no changes"}:
-                return prop, True, ""
-            ok, err = self._git_apply_check(prop.diff)
-            if ok:
-                return prop, True, ""
-            # Ask once to reformat into a proper git patch.
+        def _repair(prop: PatchProposal, err: str) -> tuple[PatchProposal, bool, str]:
+            """Ask once to reformat ``prop`` into a proper git patch and re-check it."""
             extra = (
                 "Your `diff` was rejected by `git apply --check` in the target repo. "
                 "Return a corrected unified diff that includes file headers (`diff --git`, `---`, `+++`) "
@@ -538,6 +659,19 @@ class OllamaWorkspacePatcher:
             )
             return repaired2, False, err2
 
+        def _check(prop: PatchProposal) -> tuple[bool, str]:
+            if not prop.diff or prop.diff.strip() in {"(no changes)", "(no-op)", "no changes"}:
+                return True, ""
+            return self._git_apply_check(prop.diff)
+
+        def _fallback_extra(err: str) -> str:
+            return (
+                "All previous attempts failed `git apply --check`. "
+                "Return full new file contents instead of a diff. "
+                "Prefer minimal edits that fix the failing tests."
+                + (f"\n\nlast_error:\n{err}\n" if err else "")
+            )
+
         max_attempts = max(1, int(getattr(settings, "patch_max_attempts", 1)))
         last_err = ""
         proposal: PatchProposal | None = None
@@ -552,24 +686,27 @@ class OllamaWorkspacePatcher:
                     + (f"\nprevious_diff:\n{proposal.diff}\n" if proposal else "")
                 )
             proposal0 = _call_llm(extra_prompt=extra)
-            proposal, ok, last_err = _validate_or_repair(proposal0)
+            if len(proposal0.diff.encode("utf-8")) > settings.large_diff_bytes:
+                # Repairing means re-sending and re-checking the whole diff per round,
+                # which rarely fixes a model regenerating big files; use file edits.
+                ok, last_err = self._git_apply_check(proposal0.diff)
+                if ok:
+                    return proposal0
+                proposal = proposal0
+                break
+            ok, err = _check(proposal0)
+            if ok:
+                return proposal0
+            proposal, ok, last_err = _repair(proposal0, err)
             if ok:
                 return proposal
 
         # Last resort: ask for full file edits and synthesize a diff locally.
         # This avoids corrupt unified diff headers produced by some models.
-        fallback_extra = (
-            "All previous attempts failed `git apply --check`. "
-            "Return full new file contents instead of a diff. "
-            "Prefer minimal edits that fix the failing tests."
-            + (f"\n\nlast_error:\n{last_err}\n" if last_err else "")
-        )
-        fallback = _call_llm_files(extra_prompt=fallback_extra)
-        if fallback:
-            # If it passes apply-check, use it. Otherwise continue to return the last diff with warnings.
-            okf, errf = self._git_apply_check(fallback.diff)
-            if okf:
-                return fallback
+        fallback = _call_llm_files(extra_prompt=_fallback_extra(last_err))
+        # If it passes apply-check, use it. Otherwise continue to return the last diff.
+        if fallback and self._git_apply_check(fallback.diff)[0]:
+            return fallback
 
         # If we get here, all attempts failed. Return the last diff with a warning for the pipeline/UI.
         if proposal:
@@ -589,57 +726,24 @@ class OllamaWorkspacePatcher:
         git apply with @@ -0,0 +1,N @@ appends to the beginning of an existing file
         instead of replacing it. This produces duplicate function definitions.
         """
-        import re as _re
-
         # Check for -0,0 hunk header against an existing file
-        for m in _re.finditer(r"^\+\+\+\s+b/(.+)", diff_text, flags=_re.MULTILINE):
+        for m in _PLUS_B_RE.finditer(diff_text):
             rel = m.group(1).strip()
             if (self._root / rel).exists():
                 # Check if corresponding hunk is -0,0
-                if _re.search(r"^@@ -0,0 \+", diff_text, flags=_re.MULTILINE):
+                if _ZERO_HUNK_RE.search(diff_text):
                     return True
         return False
 
     def _apply_add_only_patch_as_file_replace(self, diff_text: str) -> None:
         """Handle -0,0 patches for existing files by extracting added lines as full content."""
-        import re as _re
-
-        # Find all file sections
-        file_sections = _re.split(r"^(?=diff --git |--- a/)", diff_text, flags=_re.MULTILINE)
-        for section in file_sections:
-            if not section.strip():
-                continue
-            # Get target file path
-            m_plus = _re.search(r"^\+\+\+\s+b/(.+)", section, flags=_re.MULTILINE)
-            if not m_plus:
-                m_plus = _re.search(r"^\+\+\+\s+(.+)", section, flags=_re.MULTILINE)
-            if not m_plus:
-                continue
-            rel = m_plus.group(1).strip()
-            if rel in {"/dev/null", "dev/null"}:
-                continue
+        for rel, content in _add_only_file_contents(diff_text):
             fp = self._root / rel
-            # Only do this for -0,0 hunks on existing files
-            if not _re.search(r"^@@ -0,0 \+", section, flags=_re.MULTILINE):
-                continue
-            # Extract added lines from this section
-            added_lines = []
-            in_hunk = False
-            for line in section.splitlines(keepends=True):
-                if line.startswith("@@"):
-                    in_hunk = True
-                    continue
-                if in_hunk:
-                    if line.startswith("+"):
-                        added_lines.append(line[1:])
-                    elif not line.startswith("\\"):
-                        # context or removed lines — skip
-                        pass
-            if added_lines:
-                fp.parent.mkdir(parents=True, exist_ok=True)
-                fp.write_text("".join(added_lines), encoding="utf-8")
+            fp.parent.mkdir(parents=True, exist_ok=True)
+            fp.write_text(content, encoding="utf-8")
 
     def apply(self, proposal: PatchProposal) -> str:
+        self._apply_checks.clear()  # the workspace is about to change
         diff_text = _sanitize_unified_diff(_strip_patch_wrappers(proposal.diff))
         if not diff_text or diff_text.strip() in {"(no changes)", "(no-op)", "no changes"}:
             return proposal.title
@@ -659,11 +763,8 @@ class OllamaWorkspacePatcher:
             self._apply_add_only_patch_as_file_replace(diff_text)
             return proposal.title
 
-        patch_path = self._root / ".spec2ship_patch.diff"
-        patch_path.write_text(diff_text, encoding="utf-8")
-
-        # Validate before applying.
-        check = self._cmd.run(["git", "apply", "--check", str(patch_path)])
+        # Validate before applying. The patch goes to git on stdin, never into the tree.
+        check = self._cmd.run(["git", "apply", "--check", "-"], input=diff_text)
         if check.code != 0:
             raise RuntimeError(
                 "Patch failed `git apply --check`.\n"
@@ -671,7 +772,7 @@ class OllamaWorkspacePatcher:
                 f"stderr:\n{check.stderr}\n"
             )
 
-        res = self._cmd.run(["git", "apply", "--whitespace=nowarn", str(patch_path)])
+        res = self._cmd.run(["git", "apply", "--whitespace=nowarn", "-"], input=diff_text)
         if res.code != 0:
             raise RuntimeError(
                 f"Patch failed `git apply`.\nstdout:\n{res.stdout}\n\nstderr:\n{res.stderr}\n"
@@ -697,16 +798,217 @@ class OllamaWorkspacePatcher:
         t = _sanitize_unified_diff(_strip_patch_wrappers(diff_text))
         if not t or t.strip() in {"(no changes)", "(no-op)", "no changes"}:
             return True, ""
-        p = self._root / ".spec2ship_check.diff"
-        p.write_text(t, encoding="utf-8")
-        check = self._cmd.run(["git", "apply", "--check", str(p)])
+        key = _ApplyCheckCache.key(t)
+        cached = self._apply_checks.get(key)
+        if cached is not None:
+            return cached
+        check = self._cmd.run(["git", "apply", "--check", "-"], input=t)
         if check.code == 0:
-            return True, ""
+            return self._apply_checks.put(key, (True, ""))
         combined = (check.stdout or "") + "\n" + (check.stderr or "")
-        return False, combined.strip()
+        return self._apply_checks.put(key, (False, combined.strip()))
 
 
-_HF_MODEL_CACHE: dict[str, tuple[object, object]] = {}  # key -> (tokenizer, model)
+@lru_cache(maxsize=None)
+def _hf_deps() -> tuple[Any, Any, Any]:
+    """Import ``(torch, transformers, peft)`` on first use and hand out the modules.
+
+    Normal runs never pay for these imports; HF runs resolve them once instead of
+    re-entering the import machinery at every call site (some run per token).
+    """
+    import peft
+    import torch
+    import transformers
+
+    return torch, transformers, peft
+
+
+def _hf_model_args() -> tuple[str, str, str, str]:
+    """``(model_id, adapter, device, quantize)`` for _load_hf_model, from settings."""
+    model_id = (
+        getattr(settings, "hf_model", "") or ""
+    ).strip() or "Qwen/Qwen2.5-Coder-0.5B-Instruct"
+    adapter = (getattr(settings, "hf_adapter_path", "") or "").strip()
+    device = (getattr(settings, "hf_device", "cpu") or "cpu").strip().lower()
+    quantize = (getattr(settings, "hf_quantize", "") or "").strip().lower()
+    return model_id, adapter, device, quantize
+
+
+def warm_hf_patcher() -> None:
+    """Preload the HF patcher's dependencies (and, on CPU, its model) in this process.
+
+    Meant for the worker parent: RQ forks a fresh work horse per job, so anything
+    loaded lazily inside a job is gone when it ends, while what the parent loaded
+    before forking is shared copy-on-write. CUDA state does not survive a fork, so
+    GPU models are still loaded by the job itself.
+    """
+    _hf_deps()
+    args = _hf_model_args()
+    if args[2] != "cuda":
+        _load_hf_model(*args)
+
+
+# Loading reads and materializes GBs of weights; keep the last couple of configurations
+# per process (workers switch adapters rarely) without pinning every one ever used.
+@lru_cache(maxsize=2)
+def _load_hf_model(
+    model_id: str, adapter: str, device: str, quantize: str = ""
+) -> tuple[object, object]:
+    """Return ``(tokenizer, model)`` for ``model_id`` (+ optional PEFT ``adapter``).
+
+    Decoding is bound by streaming the weights, so on CUDA they are held in bf16
+    (fp16 where bf16 is unsupported), or quantized by bitsandbytes when ``quantize``
+    is ``"int8"`` or ``"nf4"``; prompt prefill uses FlashAttention-2 where available,
+    else PyTorch SDPA. On CPU either mode means dynamic int8 quantization of the
+    Linear layers.
+    """
+    torch, transformers, peft = _hf_deps()
+
+    tok = transformers.AutoTokenizer.from_pretrained(model_id, use_fast=True)
+    if tok.pad_token is None:
+        tok.pad_token = tok.eos_token
+
+    kwargs: dict[str, object] = {"torch_dtype": torch.float32}
+    if device == "cuda":
+        kwargs["device_map"] = "auto"
+        kwargs["torch_dtype"] = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        # FlashAttention-2 needs Ampere+ (sm_80) and the flash_attn package.
+        use_fa2 = (
+            torch.cuda.get_device_capability()[0] >= 8
+            and importlib.util.find_spec("flash_attn") is not None
+        )
+        kwargs["attn_implementation"] = "flash_attention_2" if use_fa2 else "sdpa"
+        torch.backends.cuda.matmul.allow_tf32 = True  # any fp32 matmuls left over
+        if quantize in {"int8", "nf4"} and importlib.util.find_spec("bitsandbytes") is None:
+            raise RuntimeError(
+                f"HF_QUANTIZE={quantize} on CUDA needs bitsandbytes: pip install -e '.[train]'"
+            )
+        if quantize == "int8":
+            kwargs["quantization_config"] = transformers.BitsAndBytesConfig(load_in_8bit=True)
+        elif quantize == "nf4":
+            kwargs["quantization_config"] = transformers.BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_quant_type="nf4",
+                bnb_4bit_compute_dtype=kwargs["torch_dtype"],
+                bnb_4bit_use_double_quant=True,
+            )
+    model = transformers.AutoModelForCausalLM.from_pretrained(model_id, **kwargs)
+    if adapter:
+        model = peft.PeftModel.from_pretrained(model, adapter)
+
+    if device != "cuda" and quantize in {"int8", "nf4"}:
+        # bitsandbytes kernels are CUDA-only; on CPU use PyTorch's int8 GEMMs instead.
+        # Fold any LoRA adapter in first so its Linear layers get quantized too.
+        if adapter:
+            model = model.merge_and_unload()
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    model.config.use_cache = True
+    model.eval()
+    return tok, model
+
+
+_HF_MAX_PROMPT_TOKENS = 4096
+_HF_PROMPT_HEADER = (
+    "You are a senior software engineer.\n"
+    "Return ONLY a JSON object with keys: title, rationale, diff.\n"
+    "The 'diff' must be a complete unified diff in `git diff` style "
+    "(diff --git / --- / +++ / @@ ...).\n\n"
+)
+# Batch-of-one prompts need neither masks nor segment ids; only the token ids.
+_HF_IDS_ONLY = {
+    "return_tensors": "pt",
+    "return_attention_mask": False,
+    "return_token_type_ids": False,
+}
+_HF_PREFIX_CACHE_SIZE = 4  # each entry holds a prefilled KV cache, so keep few
+_HF_PREFIX_CACHE: OrderedDict[tuple, tuple[object, object]] = OrderedDict()
+_HF_PREFIX_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=2)
+def _hf_header_len(tok) -> int:
+    """Number of leading prompt tokens taken by _HF_PROMPT_HEADER."""
+    return len(tok(_HF_PROMPT_HEADER, return_attention_mask=False).input_ids)
+
+
+def _hf_prefix_state(tok, model, model_key: tuple, prefix: str) -> tuple[object, object]:
+    """Return ``(input_ids, past_key_values)`` for a prompt prefix, memoized.
+
+    The KV cache covers every prefix token but the last, so generate() always has at
+    least one token to feed; it is ``None`` when the prefix alone overflows the window.
+    """
+    key = (model_key, hashlib.blake2b(prefix.encode("utf-8"), digest_size=16).digest())
+    with _HF_PREFIX_LOCK:
+        hit = _HF_PREFIX_CACHE.get(key)
+        if hit is not None:
+            _HF_PREFIX_CACHE.move_to_end(key)
+            return hit
+
+    torch, transformers, _ = _hf_deps()
+
+    ids = tok(prefix, **_HF_IDS_ONLY).input_ids.to(model.device)
+    kv = None
+    if 1 < ids.shape[1] <= _HF_MAX_PROMPT_TOKENS:
+        with torch.no_grad():
+            kv = model(
+                input_ids=ids[:, :-1], past_key_values=transformers.DynamicCache(), use_cache=True
+            ).past_key_values
+
+    with _HF_PREFIX_LOCK:
+        _HF_PREFIX_CACHE[key] = (ids, kv)
+        if len(_HF_PREFIX_CACHE) > _HF_PREFIX_CACHE_SIZE:
+            _HF_PREFIX_CACHE.popitem(last=False)
+    return ids, kv
+
+
+class _JsonObjectStop:
+    """Stopping criterion for ``generate()``: stop once the first JSON object closes.
+
+    Only the first balanced ``{...}`` is parsed from the completion, so every token
+    decoded after it is wasted. New tokens are decoded incrementally and scanned for
+    braces, skipping those inside JSON strings (with backslash escapes).
+    """
+
+    def __init__(self, tok, prompt_len: int) -> None:
+        self._tok = tok
+        self._seen = prompt_len
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._done = False
+
+    def feed(self, text: str) -> bool:
+        for ch in text:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == "{":
+                self._depth += 1
+            elif self._depth:
+                if ch == '"':
+                    self._in_string = True
+                elif ch == "}":
+                    self._depth -= 1
+                    if not self._depth:
+                        self._done = True
+                        break
+        return self._done
+
+    def __call__(self, input_ids, scores, **kwargs):
+        torch = _hf_deps()[0]
+        if not self._done:
+            # Structural characters are ASCII, so per-step decoding can't split them.
+            new = input_ids[0, self._seen :]
+            self._seen = input_ids.shape[1]
+            self.feed(self._tok.decode(new, skip_special_tokens=True))
+        return torch.full(
+            (input_ids.shape[0],), self._done, dtype=torch.bool, device=input_ids.device
+        )
 
 
 class HuggingFaceWorkspacePatcher:
@@ -723,6 +1025,7 @@ class HuggingFaceWorkspacePatcher:
             or settings.git_command_seconds
             or settings.max_command_seconds,
         )
+        self._apply_checks = _ApplyCheckCache()
 
     def propose(
         self,
@@ -734,9 +1037,7 @@ class HuggingFaceWorkspacePatcher:
     ) -> PatchProposal:
         # Lazy import heavy deps so normal runs don't require them.
         try:
-            import torch  # noqa: F401
-            from transformers import AutoModelForCausalLM, AutoTokenizer
-            from peft import PeftModel
+            torch, transformers, _ = _hf_deps()
         except Exception as e:  # pragma: no cover
             raise RuntimeError(
                 "HuggingFace patcher requires torch/transformers/peft. "
@@ -752,63 +1053,52 @@ class HuggingFaceWorkspacePatcher:
             max_chars=settings.code_context_max_chars,
         )
 
-        prompt = (
-            "You are a senior software engineer.\n"
-            "Return ONLY a JSON object with keys: title, rationale, diff.\n"
-            "The 'diff' must be a complete unified diff in `git diff` style "
-            "(diff --git / --- / +++ / @@ ...).\n\n"
+        # Retries only change the feedback at the end, so the stable prefix is encoded
+        # (and prefilled) once and reused; only the suffix is tokenized per attempt.
+        prefix = _HF_PROMPT_HEADER + (
             f"TICKET:\n{ticket_text}\n\n"
             f"TOOL SIGNALS:\n{signals_text}\n\n"
             f"REPO CONTEXT:\n{context}\n\n"
         )
+        suffix = ""
         if previous_error:
-            prompt += f"\nPREVIOUS ERROR:\n{previous_error}\n"
+            suffix += f"\nPREVIOUS ERROR:\n{previous_error}\n"
         if previous_diff:
-            prompt += f"\nPREVIOUS DIFF (for reference):\n{previous_diff}\n"
+            suffix += f"\nPREVIOUS DIFF (for reference):\n{previous_diff}\n"
 
-        model_id = (
-            getattr(settings, "hf_model", "") or ""
-        ).strip() or "Qwen/Qwen2.5-Coder-0.5B-Instruct"
-        adapter = (getattr(settings, "hf_adapter_path", "") or "").strip()
-        device = (getattr(settings, "hf_device", "cpu") or "cpu").strip().lower()
+        model_id, adapter, device, quantize = _hf_model_args()
         max_new = int(getattr(settings, "hf_max_new_tokens", 800) or 800)
         temperature = float(getattr(settings, "hf_temperature", 0.2) or 0.2)
         top_p = float(getattr(settings, "hf_top_p", 0.95) or 0.95)
 
-        cache_key = f"{model_id}::adapter={adapter or 'none'}::device={device}"
-        tok, model = _HF_MODEL_CACHE.get(cache_key, (None, None))
-
-        if tok is None or model is None:
-            from transformers import AutoModelForCausalLM, AutoTokenizer
-            import torch
-
-            tok = AutoTokenizer.from_pretrained(model_id, use_fast=True)
-            if tok.pad_token is None:
-                tok.pad_token = tok.eos_token
-
-            torch_dtype = torch.float16 if device == "cuda" else torch.float32
-            model = AutoModelForCausalLM.from_pretrained(
-                model_id,
-                torch_dtype=torch_dtype,
-                device_map="auto" if device == "cuda" else None,
-            )
-            if adapter:
-                from peft import PeftModel
-
-                model = PeftModel.from_pretrained(model, adapter)
+        tok, model = _load_hf_model(model_id, adapter, device, quantize)
 
-            model.eval()
-            _HF_MODEL_CACHE[cache_key] = (tok, model)
-
-        import torch
-
-        inputs = tok(prompt, return_tensors="pt", truncation=True, max_length=4096)
-        if device == "cuda":
-            inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        prefix_ids, prefix_kv = _hf_prefix_state(
+            tok, model, (model_id, adapter, device, quantize), prefix
+        )
+        input_ids = prefix_ids
+        if suffix:
+            suffix_ids = tok(suffix, add_special_tokens=False, **_HF_IDS_ONLY).input_ids
+            input_ids = torch.cat([prefix_ids, suffix_ids.to(prefix_ids.device)], dim=1)
+        gen_kwargs: dict[str, object] = {}
+        if input_ids.shape[1] > _HF_MAX_PROMPT_TOKENS:
+            # Cut from the middle (ticket/context), not the end: the instructions lead
+            # and the latest retry feedback trails, and both must stay in the window.
+            head = _hf_header_len(tok)
+            tail = input_ids[:, -(_HF_MAX_PROMPT_TOKENS - head) :]
+            input_ids = torch.cat([input_ids[:, :head], tail], dim=1)
+        elif prefix_kv is not None:
+            # generate() extends the cache in place; keep the shared one pristine.
+            gen_kwargs["past_key_values"] = copy.deepcopy(prefix_kv)
 
         with torch.no_grad():
+            # A single unpadded sequence: generate() defaults to an all-ones mask.
             gen = model.generate(
-                **inputs,
+                input_ids=input_ids,
+                **gen_kwargs,
+                stopping_criteria=transformers.StoppingCriteriaList(
+                    [_JsonObjectStop(tok, input_ids.shape[1])]
+                ),
                 max_new_tokens=max_new,
                 do_sample=(temperature > 0),
                 temperature=max(temperature, 1e-5),
@@ -817,8 +1107,7 @@ class HuggingFaceWorkspacePatcher:
                 eos_token_id=tok.eos_token_id,
             )
 
-        decoded = tok.decode(gen[0], skip_special_tokens=True)
-        completion = decoded[len(prompt) :] if decoded.startswith(prompt) else decoded
+        completion = tok.decode(gen[0, input_ids.shape[1] :], skip_special_tokens=True)
 
         # Parse JSON best-effort
         obj = _extract_json_object(completion)
@@ -840,47 +1129,21 @@ class HuggingFaceWorkspacePatcher:
         return PatchProposal(title=title, rationale=rationale, diff=diff)
 
     def _is_add_only_patch(self, diff_text: str) -> bool:
-        import re as _re
-
-        for m in _re.finditer(r"^\+\+\+\s+b/(.+)", diff_text, flags=_re.MULTILINE):
+        for m in _PLUS_B_RE.finditer(diff_text):
             rel = m.group(1).strip()
             if (self._root / rel).exists():
-                if _re.search(r"^@@ -0,0 \+", diff_text, flags=_re.MULTILINE):
+                if _ZERO_HUNK_RE.search(diff_text):
                     return True
         return False
 
     def _apply_add_only_patch_as_file_replace(self, diff_text: str) -> None:
-        import re as _re
-
-        file_sections = _re.split(r"^(?=diff --git |--- a/)", diff_text, flags=_re.MULTILINE)
-        for section in file_sections:
-            if not section.strip():
-                continue
-            m_plus = _re.search(r"^\+\+\+\s+b/(.+)", section, flags=_re.MULTILINE)
-            if not m_plus:
-                m_plus = _re.search(r"^\+\+\+\s+(.+)", section, flags=_re.MULTILINE)
-            if not m_plus:
-                continue
-            rel = m_plus.group(1).strip()
-            if rel in {"/dev/null", "dev/null"}:
-                continue
+        for rel, content in _add_only_file_contents(diff_text):
             fp = self._root / rel
-            if not _re.search(r"^@@ -0,0 \+", section, flags=_re.MULTILINE):
-                continue
-            added_lines = []
-            in_hunk = False
-            for line in section.splitlines(keepends=True):
-                if line.startswith("@@"):
-                    in_hunk = True
-                    continue
-                if in_hunk:
-                    if line.startswith("+"):
-                        added_lines.append(line[1:])
-            if added_lines:
-                fp.parent.mkdir(parents=True, exist_ok=True)
-                fp.write_text("".join(added_lines), encoding="utf-8")
+            fp.parent.mkdir(parents=True, exist_ok=True)
+            fp.write_text(content, encoding="utf-8")
 
     def apply(self, proposal: PatchProposal) -> str:
+        self._apply_checks.clear()  # the workspace is about to change
         diff_text = _sanitize_unified_diff(_strip_patch_wrappers(proposal.diff))
         if not diff_text or diff_text.strip() in {"(no changes)", "(no-op)", "no changes"}:
             return proposal.title
@@ -898,10 +1161,8 @@ class HuggingFaceWorkspacePatcher:
             self._apply_add_only_patch_as_file_replace(diff_text)
             return proposal.title
 
-        patch_path = self._root / ".spec2ship_patch.diff"
-        patch_path.write_text(diff_text, encoding="utf-8")
-
-        check = self._cmd.run(["git", "apply", "--check", str(patch_path)])
+        # The patch goes to git on stdin, never into the tree.
+        check = self._cmd.run(["git", "apply", "--check", "-"], input=diff_text)
         if check.code != 0:
             raise RuntimeError(
                 "Patch failed `git apply --check`.\n"
@@ -909,7 +1170,7 @@ class HuggingFaceWorkspacePatcher:
                 f"stderr:\n{check.stderr}\n"
             )
 
-        res = self._cmd.run(["git", "apply", "--whitespace=nowarn", str(patch_path)])
+        res = self._cmd.run(["git", "apply", "--whitespace=nowarn", "-"], input=diff_text)
         if res.code != 0:
             raise RuntimeError(
                 f"Patch failed `git apply`.\nstdout:\n{res.stdout}\n\nstderr:\n{res.stderr}\n"
@@ -935,34 +1196,34 @@ class HuggingFaceWorkspacePatcher:
         t = _sanitize_unified_diff(_strip_patch_wrappers(diff_text))
         if not t or t.strip() in {"(no changes)", "(no-op)", "no changes"}:
             return True, ""
-        p = self._root / ".spec2ship_check.diff"
-        p.write_text(t, encoding="utf-8")
-        check = self._cmd.run(["git", "apply", "--check", str(p)])
+        key = _ApplyCheckCache.key(t)
+        cached = self._apply_checks.get(key)
+        if cached is not None:
+            return cached
+        check = self._cmd.run(["git", "apply", "--check", "-"], input=t)
         if check.code == 0:
-            return True, ""
+            return self._apply_checks.put(key, (True, ""))
         combined = (check.stdout or "") + "\n" + (check.stderr or "")
-        return False, combined.strip()
+        return self._apply_checks.put(key, (False, combined.strip()))
 
 
 def _extract_json_object(text: str) -> dict:
     """Best-effort extraction of a JSON object from model output."""
     if not text:
         return {}
-    # Find the first {...} block
-    import json as _json
-    import re as _re
-
-    m = _re.search(r"\{.*\}", text, flags=_re.DOTALL)
-    if not m:
+    # From the first "{" to the last "}" (what a greedy \{.*\} search would match)
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
         return {}
-    blob = m.group(0)
+    blob = text[start : end + 1]
     try:
-        return _json.loads(blob)
+        return json.loads(blob)
     except Exception:
         # try to clean common trailing commas
-        blob2 = _re.sub(r",\s*}", "}", blob)
-        blob2 = _re.sub(r",\s*]", "]", blob2)
+        blob2 = _TRAILING_COMMA_OBJ_RE.sub("}", blob)
+        blob2 = _TRAILING_COMMA_ARR_RE.sub("]", blob2)
         try:
-            return _json.loads(blob2)
+            return json.loads(blob2)
         except Exception:
             return {}
@@ -5,6 +5,14 @@ from pathlib import Path
 
 from app.core.config import settings
 
+try:  # POSIX only; elsewhere run workspaces are always plain copies.
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the platform
+    fcntl = None
+
+# linux/fs.h FICLONE = _IOW(0x94, 9, int): share the source's extents copy-on-write.
+_FICLONE = 0x40049409
+
 
 def _ignore_patterns():
     # Avoid huge, noisy folders in copies.
@@ -25,6 +33,25 @@ def _ignore_patterns():
     )
 
 
+def _clone_file(src: str, dst: str) -> str:
+    """``shutil.copy2``, but as a reflink where the filesystem supports it.
+
+    On Btrfs/XFS (and overlayfs over them) the clone shares the source's blocks until
+    either side is written, so a run workspace costs metadata instead of a full copy.
+    Hardlinks would not be safe: patches rewrite files in place, which would also
+    change the base workspace.
+    """
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return dst
+        except OSError:
+            pass  # not supported here (or across filesystems): copy the bytes
+    return shutil.copy2(src, dst)
+
+
 def ensure_run_workspace(run_id: str, base_workspace_path: str) -> str:
     """Return the workspace path the pipeline should operate on.
 
@@ -46,7 +73,9 @@ def ensure_run_workspace(run_id: str, base_workspace_path: str) -> str:
     if not src.exists():
         raise RuntimeError(f"Workspace not found: {src}")
 
-    shutil.copytree(src, dst, dirs_exist_ok=True, ignore=_ignore_patterns())
+    shutil.copytree(
+        src, dst, dirs_exist_ok=True, ignore=_ignore_patterns(), copy_function=_clone_file
+    )
     return str(dst)
 
 
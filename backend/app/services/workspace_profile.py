@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -37,6 +38,16 @@ def _as_str(x: Any) -> str | None:
     return s or None
 
 
+def _has_python_test_file(root: Path) -> bool:
+    """``any(rglob("test_*.py")) or any(rglob("*_test.py"))`` in one early-exit walk."""
+    # Like rglob: nothing is pruned and symlinked directories are not followed.
+    for _dirpath, dirnames, filenames in os.walk(root):
+        for name in (*filenames, *dirnames):
+            if name.endswith("_test.py") or (name.startswith("test_") and name.endswith(".py")):
+                return True
+    return False
+
+
 def _auto_detect_profile(root: Path) -> WorkspaceProfile:
     """Try to detect project type and build a sensible profile."""
     # Python (pytest)
@@ -44,8 +55,7 @@ def _auto_detect_profile(root: Path) -> WorkspaceProfile:
         (root / "pyproject.toml").exists()
         or (root / "setup.py").exists()
         or (root / "setup.cfg").exists()
-        or any(root.rglob("test_*.py"))
-        or any(root.rglob("*_test.py"))
+        or _has_python_test_file(root)
     )
     if has_pytest:
         # Check if pytest is listed as dep
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+import os
 import re
+import shutil
 import time
 from typing import Iterable
-from zipfile import ZipFile
+from zipfile import ZipFile, ZipInfo
 
 
 @dataclass(frozen=True)
@@ -48,6 +52,22 @@ def resolve_workspace_path(
     return str(candidate) if candidate.exists() else default_path
 
 
+@lru_cache(maxsize=512)
+def resolve_workspace_path_cached(
+    default_path: str, workspace_name: str, workspaces_root: str = "/workspace/workspaces"
+) -> str:
+    """Memoized resolve_workspace_path for API handlers.
+
+    Call ``resolve_workspace_path_cached.cache_clear()`` whenever a workspace is
+    imported or deleted, since the result depends on what exists on disk.
+    """
+    return resolve_workspace_path(default_path, workspace_name, workspaces_root)
+
+
+# Workspaces being removed in the background are renamed with this prefix first.
+DELETING_PREFIX = ".deleting_"
+
+
 def list_workspaces(
     default_path: str, workspaces_root: str = "/workspace/workspaces"
 ) -> list[WorkspaceInfo]:
@@ -63,7 +83,7 @@ def list_workspaces(
     )
 
     for p in sorted(root.iterdir() if root.exists() else [], key=lambda x: x.name.lower()):
-        if not p.is_dir():
+        if not p.is_dir() or p.name.startswith(DELETING_PREFIX):
             continue
         # Only expose simple names.
         if "/" in p.name or "\\" in p.name or ".." in p.name:
@@ -86,6 +106,13 @@ def sanitize_workspace_name(name: str) -> str:
     return n[:64]
 
 
+_COPY_CHUNK = 1024 * 1024
+# Below this many entries, opening extra archive handles and threads costs more than
+# it saves.
+_PARALLEL_MIN_ENTRIES = 32
+_EXTRACT_MAX_WORKERS = 8
+
+
 def _should_skip_entry(rel_posix: str) -> bool:
     # Skip huge/noisy folders by default.
     # (Customers should upload source-only; deps are installed by pipeline commands.)
@@ -106,6 +133,28 @@ def _iter_zip_files(z: ZipFile) -> Iterable:
         yield info
 
 
+def _extract_batch(zip_path: str, batch: list[tuple[Path, ZipInfo]]) -> None:
+    # One ZipFile per batch: a shared handle would serialize reads on its file lock.
+    with ZipFile(zip_path) as z:
+        for out_path, info in batch:
+            # Stream in chunks so peak memory stays flat however large the entry is.
+            with z.open(info) as src, open(out_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, _COPY_CHUNK)
+
+
+def _extract_entries(zip_path: str, entries: list[tuple[Path, ZipInfo]]) -> None:
+    """Write the given entries; inflating releases the GIL, so threads scale here."""
+    workers = min(_EXTRACT_MAX_WORKERS, os.cpu_count() or 1)
+    if workers < 2 or len(entries) < _PARALLEL_MIN_ENTRIES:
+        _extract_batch(zip_path, entries)
+        return
+    # Strided batches mix large and small entries across workers.
+    batches = [entries[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for fut in [pool.submit(_extract_batch, zip_path, b) for b in batches]:
+            fut.result()  # re-raise the first failure
+
+
 def import_workspace_zip(
     zip_path: str,
     requested_name: str | None,
@@ -141,6 +190,9 @@ def import_workspace_zip(
 
     dest_resolved = dest.resolve()
 
+    # Every limit and path check runs up front, in archive order; only the accepted
+    # entries are then decompressed and written (in parallel for larger archives).
+    accepted: dict[Path, ZipInfo] = {}
     with ZipFile(zip_path) as z:
         infos = list(_iter_zip_files(z))
         if len(infos) > max_files:
@@ -178,13 +230,17 @@ def import_workspace_zip(
                 skipped += 1
                 continue
 
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            with z.open(info) as src, open(out_path, "wb") as dst:
-                dst.write(src.read())
-
+            # A repeated name is written once, with its last entry, as a serial
+            # extraction would have left it.
+            accepted.pop(out_path, None)
+            accepted[out_path] = info
             extracted_bytes += info.file_size
             file_count += 1
 
+    for parent in {p.parent for p in accepted}:
+        parent.mkdir(parents=True, exist_ok=True)
+    _extract_entries(zip_path, list(accepted.items()))
+
     # Write a small manifest for traceability
     meta = dest / ".spec2ship_workspace.json"
     meta.write_text(
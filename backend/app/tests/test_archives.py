@@ -0,0 +1,26 @@
+import io
+import os
+import zipfile
+
+from app.services.archives import _INLINE_MAX_BYTES, iter_tree_files, stream_zip
+
+
+def test_stream_zip_round_trips_a_tree(tmp_path):
+    files = {
+        "empty.txt": b"",
+        "src/mod.py": b"value = 42\n" * 100,
+        "docs/héllo wörld.md": "# ünïcode\n".encode(),
+        "data/big.bin": os.urandom(_INLINE_MAX_BYTES + 12_345),
+    }
+    for rel, data in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    archive = b"".join(stream_zip(iter_tree_files(str(tmp_path), "ws")))
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as z:
+        assert z.testzip() is None
+        assert {name: z.read(name) for name in z.namelist()} == {
+            f"ws/{rel}": data for rel, data in files.items()
+        }
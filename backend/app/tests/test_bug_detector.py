@@ -37,3 +37,23 @@ def test_dispatcher_routes_python_by_content():
 
 def test_clean_output_produces_no_signals():
     assert BugDetector().from_pytest_output("3 passed in 0.01s", "") == []
+
+
+def test_first_python_exception_reported_with_location():
+    stderr = (
+        "Traceback (most recent call last):\n"
+        '  File "src/cart.py", line 24, in total\n'
+        "    return sum(x.price for x in items)\n"
+        "AttributeError: 'NoneType' object has no attribute 'price'\n"
+        "TypeError: later, unrelated\n"
+    )
+    signals = BugDetector().from_pytest_output("", stderr)
+    runtime = next(s for s in signals if s.kind == "runtime")
+    assert runtime.summary == "AttributeError"
+    assert runtime.file_hint == "src/cart.py:24"
+
+
+def test_dispatcher_needs_py_file_to_route_passed_to_pytest():
+    stdout = "PASSED lint\n--- FAIL: TestDiscount (0.00s)\nFAIL\n"
+    signals = BugDetector().from_output(stdout, "", language=None)
+    assert any("Go test" in s.summary for s in signals)
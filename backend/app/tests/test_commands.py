@@ -0,0 +1,42 @@
+import sys
+import time
+
+from app.services import commands
+from app.services.commands import CommandRunner
+
+
+def test_input_round_trips_through_stdin(tmp_path):
+    runner = CommandRunner(str(tmp_path))
+    code = "import sys; sys.stdout.write(sys.stdin.read().upper())"
+    result = runner.run([sys.executable, "-c", code], input="héllo\nworld\n")
+    assert result.code == 0
+    assert result.stdout == "HÉLLO\nWORLD\n"
+
+
+def test_long_output_keeps_only_the_tail(tmp_path):
+    runner = CommandRunner(str(tmp_path))
+    code = "import sys; sys.stdout.write('a' * 250_000 + 'END')"
+    result = runner.run([sys.executable, "-c", code])
+    assert result.code == 0
+    assert result.stdout.startswith("[... 50003 earlier bytes truncated]\n")
+    assert result.stdout.endswith("a" * 1000 + "END")
+    assert len(result.stdout.split("\n", 1)[1]) == 200_000
+
+
+def test_timeout_kills_the_command_and_reports_124(tmp_path):
+    runner = CommandRunner(str(tmp_path))
+    code = "import time; print('started', flush=True); time.sleep(30)"
+    result = runner.run([sys.executable, "-c", code], timeout_seconds=1)
+    assert result.code == 124
+    assert result.stdout == "started\n"
+    assert result.stderr.endswith("[timeout] command exceeded 1s")
+
+
+def test_backgrounded_grandchild_does_not_block_the_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(commands, "_DRAIN_JOIN_SECONDS", 0.5)
+    runner = CommandRunner(str(tmp_path))
+    start = time.monotonic()
+    result = runner.run(["sh", "-c", "sleep 5 & echo done"])
+    assert time.monotonic() - start < 3
+    assert result.code == 0
+    assert result.stdout == "done\n"
@@ -32,3 +32,12 @@ def test_snapshot_files_reads_only_matching_globs(tmp_path):
 
     assert list(snap.values()) == ["value = 42\n"]
     assert all(rel.endswith("mod.py") for rel in snap)
+
+
+def test_snapshot_files_sees_rewritten_files(tmp_path):
+    mod = tmp_path / "mod.py"
+    mod.write_text("value = 1\n", encoding="utf-8")
+    assert snapshot_files(str(tmp_path), ["*.py"]) == {"mod.py": "value = 1\n"}
+
+    mod.write_text("value = 22\n", encoding="utf-8")
+    assert snapshot_files(str(tmp_path), ["*.py"]) == {"mod.py": "value = 22\n"}
@@ -35,3 +35,11 @@ def test_plain_ticket_without_directives():
     mode, cfg = parse_spec2ship_directives("Fix the failing pricing tests please.")
     assert mode is None
     assert cfg == {}
+
+
+def test_repeated_parse_returns_independent_config():
+    ticket = "#spec2ship: train\nepochs=3"
+    _, first = parse_spec2ship_directives(ticket)
+    first["epochs"] = "99"
+    _, second = parse_spec2ship_directives(ticket)
+    assert second == {"epochs": "3"}
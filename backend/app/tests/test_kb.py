@@ -1,4 +1,4 @@
-from app.services.kb import KnowledgeBase
+from app.services.kb import KbDoc, KnowledgeBase
 
 
 def test_empty_kb_returns_no_results(tmp_path):
@@ -47,3 +47,111 @@ def test_ingest_folder_counts_markdown(tmp_path):
     kb = KnowledgeBase(str(tmp_path / "kb.json"))
     count = kb.ingest_folder(str(docs), glob="*.md")
     assert count == 2
+
+
+def test_search_returns_only_matching_docs_and_tolerates_empty_ones(tmp_path):
+    kb = KnowledgeBase(str(tmp_path / "kb.json"))
+    kb.upsert("empty", "blank", "   ")
+    kb.upsert("d1", "pricing", "discount rounding uses decimal half up")
+    kb.upsert("d2", "shipping", "carrier weight zones and labels")
+
+    results = kb.search("discount", k=4)
+    assert [d.doc_id for d in results] == ["d1"]
+
+
+def test_saved_index_is_reused_only_for_the_same_docs_file(tmp_path):
+    path = tmp_path / "kb.json"
+    kb = KnowledgeBase(str(path))
+    kb.upsert("d1", "carts", "persistent content about carts")
+    kb.upsert("d2", "taxes", "vat and sales tax rules")
+    kb.save()
+
+    reloaded = KnowledgeBase(str(path))
+    reloaded.load()
+    assert (tmp_path / "kb.index" / "meta.json").exists()
+    assert reloaded.search("tax")[0].doc_id == "d2"
+
+    other = KnowledgeBase(str(path))
+    other.upsert("d3", "shipping", "carrier zones")
+    other.save()
+    reloaded.load()
+    assert reloaded.search("carrier")[0].doc_id == "d3"
+
+
+def test_pruned_top_k_matches_the_full_ranking(tmp_path):
+    kb = KnowledgeBase(str(tmp_path / "kb.json"))
+    for i in range(40):
+        words = ["common"] * (i % 7 + 1) + ["rare"] * (i % 3 == 0) * (i % 5 + 1)
+        kb.upsert(f"d{i}", "t", " ".join(words + ["filler"] * i))
+
+    full = [d.doc_id for d in kb.search("rare common common", k=40)]
+    for k in (1, 3, 10):
+        assert [d.doc_id for d in kb.search("rare common common", k=k)] == full[:k]
+
+
+def test_terms_in_most_docs_are_dropped_from_large_indexes(tmp_path):
+    docs = [KbDoc(doc_id=f"d{i}", title="t", text=f"the note number{i}") for i in range(1_000)]
+    docs.append(KbDoc(doc_id="tax", title="t", text="the vat rules"))
+    truncated = KnowledgeBase(str(tmp_path / "kb.json"))
+    full = KnowledgeBase(str(tmp_path / "kb.json"), stop_df_ratio=None)
+    for kb in (truncated, full):
+        for d in docs:
+            kb._put(d)
+        kb._rebuild()
+
+    assert truncated.search("the") == []
+    assert [d.doc_id for d in truncated.search("the vat")] == ["tax"]
+    assert len(full.search("the", k=5)) == 5
+
+
+def test_batch_and_token_search_match_single_queries(tmp_path):
+    kb = KnowledgeBase(str(tmp_path / "kb.json"))
+    kb.upsert("d1", "pricing", "discount rounding uses decimal half up")
+    kb.upsert("d2", "shipping", "carrier weight zones and labels")
+
+    queries = ["discount", "carrier zones", "nothing here"]
+    assert kb.search_batch(queries, k=2) == [kb.search(q, k=2) for q in queries]
+    assert kb.search_tokens(["carrier", "zones"], k=2) == kb.search("Carrier ZONES", k=2)
+
+
+def test_cached_results_are_dropped_when_the_index_changes(tmp_path):
+    kb = KnowledgeBase(str(tmp_path / "kb.json"))
+    kb.upsert("d1", "pricing", "discount rounding")
+    assert [d.doc_id for d in kb.search("discount")] == ["d1"]
+    assert [d.doc_id for d in kb.search("Discount!")] == ["d1"]
+
+    kb.upsert("d2", "promo", "discount discount codes")
+    assert [d.doc_id for d in kb.search("discount")] == ["d2", "d1"]
+
+
+def test_reingest_skips_unchanged_files(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text("alpha rules", encoding="utf-8")
+    (docs / "b.md").write_text("beta rules", encoding="utf-8")
+    path = tmp_path / "kb.json"
+    KnowledgeBase(str(path)).ingest_folder(str(docs))
+
+    (docs / "b.md").write_text("gamma rules", encoding="utf-8")
+    kb = KnowledgeBase(str(path))
+    kb.load()
+    put = []
+    monkeypatch.setattr(kb, "_put", lambda doc, _put=kb._put: put.append(doc.title) or _put(doc))
+    assert kb.ingest_folder(str(docs)) == 2
+    assert put == ["b.md"]
+    assert kb.search("gamma")[0].title == "b.md"
+
+
+def test_reingest_of_unchanged_folder_does_not_rewrite_the_kb(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text("alpha rules", encoding="utf-8")
+    path = tmp_path / "kb.json"
+    KnowledgeBase(str(path)).ingest_folder(str(docs))
+
+    kb = KnowledgeBase(str(path))
+    kb.load()
+    saves = []
+    monkeypatch.setattr(kb, "save", lambda: saves.append(1))
+    assert kb.ingest_folder(str(docs)) == 1
+    assert saves == []
@@ -0,0 +1,46 @@
+import warnings
+from zipfile import ZipFile
+
+from app.services import workspaces
+from app.services.workspaces import import_workspace_zip
+
+
+def test_threaded_import_extracts_every_entry_and_last_duplicate_wins(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspaces.os, "cpu_count", lambda: 4)
+    batches = []
+    extract_batch = workspaces._extract_batch
+    monkeypatch.setattr(
+        workspaces,
+        "_extract_batch",
+        lambda zip_path, batch: batches.append(len(batch)) or extract_batch(zip_path, batch),
+    )
+
+    zip_path = tmp_path / "repo.zip"
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # zipfile warns on the duplicate name
+        with ZipFile(zip_path, "w") as z:
+            z.writestr("src/dup.py", "first = 1\n")
+            for i in range(40):
+                z.writestr(f"src/pkg{i % 4}/mod{i}.py", f"value = {i}\n")
+            z.writestr("src/dup.py", "last = 2\n")
+
+    result = import_workspace_zip(
+        str(zip_path),
+        "repo",
+        str(tmp_path / "workspaces"),
+        max_files=100,
+        max_total_bytes=1_000_000,
+        max_file_bytes=1_000_000,
+    )
+
+    assert len(batches) == 4
+    ws = tmp_path / "workspaces" / result.name
+    assert result.file_count == 42
+    assert result.extracted_bytes == len("first = 1\n") + len("last = 2\n") + sum(
+        len(f"value = {i}\n") for i in range(40)
+    )
+    assert result.skipped_files == 0
+    assert (ws / "src" / "dup.py").read_text(encoding="utf-8") == "last = 2\n"
+    for i in range(40):
+        path = ws / "src" / f"pkg{i % 4}" / f"mod{i}.py"
+        assert path.read_text(encoding="utf-8") == f"value = {i}\n"
@@ -148,7 +148,10 @@ class RunPipeline:
 
             if code != 0:
                 self._steps.set_failed(
-                    s.id, error="Preflight failed (workspace/environment).", log_path=log_path
+                    s.id,
+                    error="Preflight failed (workspace/environment).",
+                    log_path=log_path,
+                    commit=False,
                 )
                 self._runs.set_status(run_id, "failed")
                 return UseCaseResult(ok=False, message="Preflight failed")
@@ -172,6 +175,7 @@ class RunPipeline:
                     s.id,
                     error="Baseline command failed to run (environment/config). Check preflight log.",
                     log_path=log_path,
+                    commit=False,
                 )
                 self._runs.set_status(run_id, "failed")
                 return UseCaseResult(ok=False, message="Baseline command failed")
@@ -374,6 +378,7 @@ class RunPipeline:
                     s.id,
                     error="Invalid patch. Click 'Regenerate Patch' to retry.",
                     log_path=bad_path,
+                    commit=False,
                 )
                 self._runs.set_status(run_id, "failed")
                 return UseCaseResult(ok=False, message="Invalid patch")
@@ -394,11 +399,13 @@ class RunPipeline:
         if decision != "yes":
             if s.status != "waiting":
                 self._steps.set_waiting(
-                    s.id, summary="Approve or reject the proposed patch to continue."
+                    s.id,
+                    summary="Approve or reject the proposed patch to continue.",
+                    commit=False,
                 )
             self._runs.set_status(run_id, "waiting_approval")
             if decision == "rejected":
-                self._steps.set_failed(s.id, error="Patch rejected by user")
+                self._steps.set_failed(s.id, error="Patch rejected by user", commit=False)
                 self._runs.set_status(run_id, "failed")
                 return UseCaseResult(ok=False, message="Rejected")
             return UseCaseResult(ok=True, message="Waiting for approval")
@@ -417,14 +424,18 @@ class RunPipeline:
             decision = (run.patch_approved or "no").lower() if run else "no"
             if decision != "yes":
                 self._steps.set_waiting(
-                    steps_by_name["Waiting for approval"].id, summary="Approval required"
+                    steps_by_name["Waiting for approval"].id,
+                    summary="Approval required",
+                    commit=False,
                 )
                 self._runs.set_status(run_id, "waiting_approval")
                 return UseCaseResult(ok=True, message="Waiting for approval")
 
             prop_meta = self._store.run_dir(str(run_id)) / "proposal.json"
             if not prop_meta.exists():
-                self._steps.set_failed(s.id, error="No proposal.json. Click 'Regenerate Patch'.")
+                self._steps.set_failed(
+                    s.id, error="No proposal.json. Click 'Regenerate Patch'.", commit=False
+                )
                 self._runs.set_status(run_id, "failed")
                 return UseCaseResult(ok=False, message="No proposal")
 
@@ -456,6 +467,7 @@ class RunPipeline:
                     s.id,
                     error="Apply failed. Use 'Retry Apply' or 'Regenerate Patch'.",
                     log_path=err_path,
+                    commit=False,
                 )
                 self._runs.set_status(run_id, "failed")
                 return UseCaseResult(ok=False, message="Apply failed")
@@ -492,9 +504,9 @@ class RunPipeline:
                     s.id,
                     error="Post-checks still failing. Use 'Regenerate Patch'.",
                     log_path=log_path,
+                    commit=False,
                 )
-                self._runs.set_patch_decision(run_id, "no")
-                self._runs.set_status(run_id, "failed")
+                self._runs.set_state(run_id, status="failed", patch_decision="no")
                 write_artifact(
                     "next_actions",
                     "next_actions.md",
@@ -630,6 +642,7 @@ class RunPipeline:
                         s_post.id,
                         summary=f"All checks passed (after {_repair_iter} auto-repair(s))",
                         log_path=self._store.run_dir(str(run_id)) / "post_checks.log",
+                        commit=False,
                     )
                     self._runs.set_status(run_id, "running")
                     break
@@ -659,7 +672,9 @@ class RunPipeline:
             ensure_not_canceled()
             report = self._build_report(run_id, ws, profile)
             path = write_artifact("report", "report.md", report)
-            self._steps.set_success(s.id, summary="Report generated", artifact_path=path)
+            self._steps.set_success(
+                s.id, summary="Report generated", artifact_path=path, commit=False
+            )
 
         final_ok = post_ok and smoke_ok
         self._runs.set_status(run_id, "completed" if final_ok else "failed")
@@ -672,7 +687,6 @@ class RunPipeline:
         from app.services.llm.ollama import OllamaClient
 
         try:
-            client = OllamaClient(settings.ollama_base_url, timeout_seconds=120)
             prompt = (
                 "You are a senior software engineer. Create a concise fix plan.\n\n"
                 f"TICKET:\n{ticket_text}\n\n"
@@ -681,11 +695,12 @@ class RunPipeline:
                 "Return a short markdown plan with sections: ## Root Cause, ## Fix Strategy, ## Files to Change\n"
                 "Be specific about which functions/lines need changing. Max 400 words."
             )
-            resp = client.generate(
-                model=settings.ollama_model,
-                prompt=prompt,
-                options={"temperature": 0.1, "num_ctx": 4096},
-            )
+            with OllamaClient(settings.ollama_base_url, timeout_seconds=120) as client:
+                resp = client.generate(
+                    model=settings.ollama_model,
+                    prompt=prompt,
+                    options={"temperature": 0.1, "num_ctx": 4096},
+                )
             if resp.response.strip():
                 return f"# AI-Generated Plan\n\n{resp.response.strip()}\n"
         except Exception:
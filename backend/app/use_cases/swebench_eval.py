@@ -106,7 +106,7 @@ class RunSWEbenchEval:
             )
             p = self._store.write_text(str(run_id), "eval_error.txt", msg)
             self._artifacts.add(run_id, "eval_error", p)
-            self._steps.set_failed(s.id, error=msg, log_path=p)
+            self._steps.set_failed(s.id, error=msg, log_path=p, commit=False)
             self._runs.set_status(run_id, "failed")
             return EvalResult(ok=False, message=msg)
 
@@ -136,7 +136,7 @@ class RunSWEbenchEval:
             msg = f"ML script not found: {gen_script}. Ensure ./ml is mounted to {settings.ml_dir}."
             p = self._store.write_text(str(run_id), "eval_error.txt", msg)
             self._artifacts.add(run_id, "eval_error", p)
-            self._steps.set_failed(s.id, error=msg, log_path=p)
+            self._steps.set_failed(s.id, error=msg, log_path=p, commit=False)
             self._runs.set_status(run_id, "failed")
             return EvalResult(ok=False, message=msg)
 
@@ -176,7 +176,7 @@ class RunSWEbenchEval:
                 err_path = self._store.write_text(str(run_id), "eval_error.txt", detail)
                 self._artifacts.add(run_id, "eval_error", err_path)
                 msg = f"{msg} | {detail.splitlines()[0]}"
-            self._steps.set_failed(s.id, error=msg, log_path=gen_log_path)
+            self._steps.set_failed(s.id, error=msg, log_path=gen_log_path, commit=False)
             self._runs.set_status(run_id, "failed")
             return EvalResult(ok=False, message=msg)
 
@@ -219,7 +219,7 @@ class RunSWEbenchEval:
                 err_path = self._store.write_text(str(run_id), "eval_error.txt", detail)
                 self._artifacts.add(run_id, "eval_error", err_path)
                 msg = f"{msg} | {detail.splitlines()[0]}"
-            self._steps.set_failed(s.id, error=msg, log_path=harness_log_path)
+            self._steps.set_failed(s.id, error=msg, log_path=harness_log_path, commit=False)
             self._runs.set_status(run_id, "failed")
             return EvalResult(ok=False, message=msg)
 
@@ -254,7 +254,7 @@ class RunSWEbenchEval:
 
         if rep.code != 0 or not report_path.exists():
             msg = "Report generation failed (see report_build.log)"
-            self._steps.set_failed(s.id, error=msg, log_path=rep_log_path)
+            self._steps.set_failed(s.id, error=msg, log_path=rep_log_path, commit=False)
             self._runs.set_status(run_id, "failed")
             return EvalResult(ok=False, message=msg)
 
@@ -269,7 +269,11 @@ class RunSWEbenchEval:
         self._artifacts.add(run_id, "metrics", metrics_path)
 
         self._steps.set_success(
-            s.id, summary="Report ready", artifact_path=str(report_path), log_path=rep_log_path
+            s.id,
+            summary="Report ready",
+            artifact_path=str(report_path),
+            log_path=rep_log_path,
+            commit=False,
         )
 
         self._runs.set_status(run_id, "completed")
@@ -117,7 +117,7 @@ class RunSWEbenchTrainLoRA:
             )
             p = self._store.write_text(str(run_id), "train_eval_error.txt", msg)
             self._artifacts.add(run_id, "train_eval_error", p)
-            self._steps.set_failed(s.id, error=msg, log_path=p)
+            self._steps.set_failed(s.id, error=msg, log_path=p, commit=False)
             self._runs.set_status(run_id, "failed")
             return TrainEvalResult(ok=False, message=msg)
 
@@ -155,7 +155,7 @@ class RunSWEbenchTrainLoRA:
             msg = f"Training script not found: {train_script}. Ensure ./ml is mounted to {settings.ml_dir}."
             p = self._store.write_text(str(run_id), "train_error.txt", msg)
             self._artifacts.add(run_id, "train_error", p)
-            self._steps.set_failed(s.id, error=msg, log_path=p)
+            self._steps.set_failed(s.id, error=msg, log_path=p, commit=False)
             self._runs.set_status(run_id, "failed")
             return TrainEvalResult(ok=False, message=msg)
 
@@ -193,7 +193,7 @@ class RunSWEbenchTrainLoRA:
 
         if tr.code != 0 or not adapter_dir.exists():
             msg = "LoRA training failed (see train_lora.log)"
-            self._steps.set_failed(s.id, error=msg, log_path=tr_log_path)
+            self._steps.set_failed(s.id, error=msg, log_path=tr_log_path, commit=False)
             self._runs.set_status(run_id, "failed")
             return TrainEvalResult(ok=False, message=msg)
 
@@ -214,7 +214,7 @@ class RunSWEbenchTrainLoRA:
             msg = f"HF generation script not found: {gen_script}. Ensure ./ml is mounted to {settings.ml_dir}."
             p = self._store.write_text(str(run_id), "predictions_error.txt", msg)
             self._artifacts.add(run_id, "predictions_error", p)
-            self._steps.set_failed(s.id, error=msg, log_path=p)
+            self._steps.set_failed(s.id, error=msg, log_path=p, commit=False)
             self._runs.set_status(run_id, "failed")
             return TrainEvalResult(ok=False, message=msg)
 
@@ -250,7 +250,7 @@ class RunSWEbenchTrainLoRA:
 
         if gen.code != 0 or not predictions_path.exists():
             msg = "Failed to generate HF predictions (see predictions_hf_generate.log)"
-            self._steps.set_failed(s.id, error=msg, log_path=gen_log_path)
+            self._steps.set_failed(s.id, error=msg, log_path=gen_log_path, commit=False)
             self._runs.set_status(run_id, "failed")
             return TrainEvalResult(ok=False, message=msg)
 
@@ -287,7 +287,7 @@ class RunSWEbenchTrainLoRA:
         results_json = out_dir / "evaluation_results" / str(run_id) / "results.json"
         if harness.code != 0 or not results_json.exists():
             msg = "Harness failed or results.json missing (see harness_hf.log)"
-            self._steps.set_failed(s.id, error=msg, log_path=harness_log_path)
+            self._steps.set_failed(s.id, error=msg, log_path=harness_log_path, commit=False)
             self._runs.set_status(run_id, "failed")
             return TrainEvalResult(ok=False, message=msg)
 
@@ -322,7 +322,7 @@ class RunSWEbenchTrainLoRA:
 
         if rep.code != 0 or not report_path.exists():
             msg = "Report generation failed (see report_hf_build.log)"
-            self._steps.set_failed(s.id, error=msg, log_path=rep_log_path)
+            self._steps.set_failed(s.id, error=msg, log_path=rep_log_path, commit=False)
             self._runs.set_status(run_id, "failed")
             return TrainEvalResult(ok=False, message=msg)
 
@@ -337,7 +337,11 @@ class RunSWEbenchTrainLoRA:
         self._artifacts.add(run_id, "metrics_hf", metrics_path)
 
         self._steps.set_success(
-            s.id, summary="Report ready", artifact_path=str(report_path), log_path=rep_log_path
+            s.id,
+            summary="Report ready",
+            artifact_path=str(report_path),
+            log_path=rep_log_path,
+            commit=False,
         )
         self._runs.set_status(run_id, "completed")
         return TrainEvalResult(ok=True, message="Completed")
@@ -12,6 +12,12 @@ listen = ["default"]
 def main() -> None:
     redis_conn = Redis.from_url(settings.redis_url)
     with Connection(redis_conn):
+        if settings.patcher_mode == "hf" and settings.hf_preload:
+            # Jobs run in forked children; whatever is loaded here is inherited by each.
+            from app.services.patches import warm_hf_patcher
+
+            log.info("Preloading HuggingFace patcher...")
+            warm_hf_patcher()
         worker = Worker(map(Queue, listen))
         log.info("RQ worker starting...")
         worker.work()